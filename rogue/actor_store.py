@@ -0,0 +1,160 @@
+import numpy as np
+
+from rogue.entity import WALK_SPEED
+from rogue.enums import AIRoundState, AnimState, Direction, TileState
+
+
+class ActorStore:
+    """Movement and animation state of many enemies in contiguous arrays.
+
+    step() advances every actor in one vectorized pass, the Enemy sprites only
+    get their rect and image written back when those actually change.
+    """
+
+    fields = ("position", "target", "has_target", "facing", "round_state", "anim_state", "queued_anim",
+              "anim_idx", "anim_len", "anim_timer", "anim_frame_length", "shown_image")
+
+    def __init__(self, capacity: int = 64):
+        self.count = 0
+        self.actors = []
+        self.capacity = 0
+
+        self.position = np.zeros((0, 2), dtype=np.float64)
+        self.target = np.zeros((0, 2), dtype=np.float64)
+        self.has_target = np.zeros(0, dtype=bool)
+        self.facing = np.zeros(0, dtype=np.int8)
+        self.round_state = np.zeros(0, dtype=np.int8)
+        self.anim_state = np.zeros(0, dtype=np.int8)
+        self.queued_anim = np.zeros(0, dtype=np.int8)
+        self.anim_idx = np.zeros(0, dtype=np.int16)
+        self.anim_len = np.zeros(0, dtype=np.int16)
+        self.anim_timer = np.zeros(0, dtype=np.float64)
+        self.anim_frame_length = np.zeros(0, dtype=np.float64)
+        # Encodes the image each sprite currently shows, -1 when unknown
+        self.shown_image = np.zeros(0, dtype=np.int32)
+        self.grow(capacity)
+
+    def grow(self, capacity: int):
+        for name in self.fields:
+            old = getattr(self, name)
+            new = np.zeros((capacity, *old.shape[1:]), dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def add(self, enemy) -> int:
+        if self.count == self.capacity:
+            self.grow(self.capacity * 2)
+        i = self.count
+        self.count += 1
+        self.actors.append(enemy)
+
+        animator = enemy.animator
+        self.position[i] = enemy.float_position
+        self.target[i] = enemy.target_position if enemy.target_position is not None else enemy.float_position
+        self.has_target[i] = enemy.target_position is not None
+        self.facing[i] = enemy.facing_direction.value
+        self.round_state[i] = enemy.round_state.value
+        self.anim_state[i] = animator.current_state.value
+        self.queued_anim[i] = animator.next_queued_animation.value
+        self.anim_idx[i] = animator.anim_idx
+        self.anim_len[i] = animator.anim_len
+        self.anim_timer[i] = animator.anim_timer
+        self.anim_frame_length[i] = animator.anim_frame_length
+        self.shown_image[i] = -1
+
+        enemy.actor_store = self
+        enemy.store_index = i
+        return i
+
+    def remove(self, enemy):
+        """Drop an enemy, the last actor takes its slot."""
+        i = enemy.store_index
+        last = self.count - 1
+        for name in self.fields:
+            array = getattr(self, name)
+            array[i] = array[last]
+        self.actors[i] = self.actors[last]
+        self.actors[i].store_index = i
+        self.actors.pop()
+        self.count -= 1
+
+        enemy.actor_store = None
+        enemy.store_index = -1
+
+    def shift(self, offset: tuple[float, float]):
+        """Move every actor's position and target by the same pixel offset."""
+        self.position[:self.count] += offset
+        self.target[:self.count] += offset
+
+    def set_target(self, index: int, target: tuple[int, int]):
+        self.target[index] = target
+        self.has_target[index] = True
+
+    def step(self, dt: float, map_state: np.ndarray):
+        """Advance animation timers and movement of every actor, same rules as Enemy.update."""
+        n = self.count
+        if not n:
+            return
+
+        # Animation, as in Animator.update
+        anim_state = self.anim_state[:n]
+        queued_anim = self.queued_anim[:n]
+        anim_idx = self.anim_idx[:n]
+        anim_timer = self.anim_timer[:n]
+        anim_timer += dt
+        advance = anim_timer > self.anim_frame_length[:n]
+        anim_timer[advance] = 0
+        anim_idx[advance] = (anim_idx[advance] + 1) % self.anim_len[:n][advance]
+        take_queued = advance & (anim_idx == 0) & (queued_anim != AnimState.NONE.value)
+        anim_state[take_queued] = queued_anim[take_queued]
+        queued_anim[take_queued] = AnimState.NONE.value
+
+        # Movement, WALK_SPEED pixels per second towards the target
+        step = WALK_SPEED * dt
+        position = self.position[:n]
+        target = self.target[:n]
+        has_target = self.has_target[:n]
+        delta = target - position
+        distance = np.hypot(delta[:, 0], delta[:, 1])
+        moving = has_target & (distance > step)
+        arrived = has_target & ~moving
+
+        start_running = moving & (anim_state != AnimState.RUN.value)
+        anim_state[start_running] = AnimState.RUN.value
+        anim_idx[start_running] = 0
+        anim_timer[start_running] = 0
+        position[moving] += delta[moving] / distance[moving, None] * step
+        self.facing[:n][moving] = np.where(delta[moving, 0] < 0, Direction.LEFT.value, Direction.RIGHT.value)
+        self.round_state[:n][moving] = AIRoundState.MOVING.value
+
+        position[arrived] = target[arrived]
+        has_target[arrived] = False
+        self.round_state[:n][arrived] = AIRoundState.DONE.value
+        queued_anim[arrived] = AnimState.IDLE.value
+
+        # Write back to the sprites that moved
+        for i in np.nonzero(moving | arrived)[0].tolist():
+            actor = self.actors[i]
+            actor.float_position.update(position[i, 0], position[i, 1])
+            actor.rect.x = actor.float_position.x
+            actor.rect.y = actor.float_position.y
+            actor.health_bar.update_based_on_parent_pos(actor.rect)
+            actor.facing_direction = Direction(int(self.facing[i]))
+            if arrived[i]:
+                actor.round_state = AIRoundState.DONE
+                actor.target_position = None
+                if actor.scheduler is not None:
+                    actor.scheduler.finished_moving()
+            else:
+                actor.round_state = AIRoundState.MOVING
+
+        # Only swap the images whose frame changed, hidden actors aren't drawn and keep theirs
+        tiles = (np.where(has_target[:, None], target, position) // 16).astype(np.intp)
+        visible = map_state[tiles[:, 0], tiles[:, 1]] == TileState.VISIBLE
+        image_key = np.where(visible, (self.facing[:n].astype(np.int32) * 8 + anim_state) * 256 + anim_idx + 1, 0)
+        for i in np.nonzero(visible & (image_key != self.shown_image[:n]))[0].tolist():
+            actor = self.actors[i]
+            actor.image = actor.animator.states[Direction(int(self.facing[i]))][AnimState(int(anim_state[i]))][
+                int(anim_idx[i])]
+        self.shown_image[:n] = image_key
@@ -0,0 +1,9 @@
+import pygame
+
+
+def load_image(path: str) -> pygame.surface.Surface:
+    """Load an image, converted to the display pixel format if there is a display to convert to."""
+    image = pygame.image.load(path)
+    if pygame.display.get_surface() is None:
+        return image
+    return image.convert_alpha()
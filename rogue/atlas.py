@@ -0,0 +1,126 @@
+"""Packed texture atlas of every tile and character frame.
+
+Build it after changing anything under resources/:
+python -m rogue.atlas
+"""
+import glob
+import json
+import os
+from os.path import join
+from typing import Optional
+
+import pygame
+
+from rogue.assets import load_image
+
+ATLAS_VERSION = 1
+ATLAS_IMAGE = join("resources", "atlas.png")
+ATLAS_INDEX = join("resources", "atlas.json")
+ATLAS_WIDTH = 512
+TILE_COUNT = 256 + 1
+
+
+def tile_name(idx: int) -> str:
+    return f"tiles/{idx}"
+
+
+def frame_name(character_name: str, state_folder: str, frame_file: str) -> str:
+    return f"character/{character_name}/{state_folder}/{frame_file}"
+
+
+def cut_tile(tileset: pygame.surface.Surface, idx: int) -> pygame.surface.Surface:
+    """Return the idx-th 16x16 cell of the bitmask tileset on an opaque surface."""
+    tmp_surface = pygame.Surface((16, 16))
+    x = idx % 24
+    y = idx // 24
+    tmp_surface.blit(tileset, (0, 0), (x * 16, y * 16, 16, 16))
+    return tmp_surface
+
+
+class Atlas:
+    """One image holding every sprite, handed out as subsurfaces that share its pixels."""
+
+    def __init__(self, image: pygame.surface.Surface, rects: dict[str, tuple[int, int, int, int]]):
+        self.image = image
+        self.rects = rects
+        self.surfaces: dict[str, pygame.surface.Surface] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.rects
+
+    def get(self, name: str) -> pygame.surface.Surface:
+        surface = self.surfaces.get(name)
+        if surface is None:
+            surface = self.image.subsurface(self.rects[name])
+            self.surfaces[name] = surface
+        return surface
+
+    @classmethod
+    def load(cls, image_path: str = ATLAS_IMAGE, index_path: str = ATLAS_INDEX) -> Optional["Atlas"]:
+        """Return the prebuilt atlas, None if it has not been built or is outdated."""
+        if not (os.path.exists(image_path) and os.path.exists(index_path)):
+            return None
+        with open(index_path) as infile:
+            index = json.load(infile)
+        if index.get("version") != ATLAS_VERSION:
+            return None
+        return cls(load_image(image_path), {name: tuple(rect) for name, rect in index["sprites"].items()})
+
+
+_atlas: Optional[Atlas] = None
+_atlas_loaded = False
+
+
+def get_atlas() -> Optional[Atlas]:
+    """Return the process-wide atlas, read from disk on first use."""
+    global _atlas, _atlas_loaded
+    if not _atlas_loaded:
+        _atlas = Atlas.load()
+        _atlas_loaded = True
+    return _atlas
+
+
+def collect_sprites() -> dict[str, pygame.surface.Surface]:
+    sprites = {}
+    tileset = pygame.image.load(join("resources", "tiles", "ff.png"))
+    for idx in range(TILE_COUNT):
+        sprites[tile_name(idx)] = cut_tile(tileset, idx)
+    for path in sorted(glob.glob(join("resources", "character", "*", "*", "*.png"))):
+        character_dir, frame_file = os.path.split(path)
+        character_dir, state_folder = os.path.split(character_dir)
+        character_name = os.path.basename(character_dir)
+        sprites[frame_name(character_name, state_folder, os.path.splitext(frame_file)[0])] = pygame.image.load(path)
+    return sprites
+
+
+def pack(sizes: dict[str, tuple[int, int]], width: int) -> tuple[dict[str, tuple[int, int, int, int]], int]:
+    """Shelf-pack the sizes into rows of the given width, tallest first. Return the rects and the total height."""
+    rects = {}
+    x = y = shelf_height = 0
+    for name, (w, h) in sorted(sizes.items(), key=lambda item: (-item[1][1], item[0])):
+        if x + w > width:
+            x = 0
+            y += shelf_height
+            shelf_height = 0
+        rects[name] = (x, y, w, h)
+        x += w
+        shelf_height = max(shelf_height, h)
+    return rects, y + shelf_height
+
+
+def build(image_path: str = ATLAS_IMAGE, index_path: str = ATLAS_INDEX):
+    sprites = collect_sprites()
+    rects, height = pack({name: sprite.get_size() for name, sprite in sprites.items()}, ATLAS_WIDTH)
+    image = pygame.Surface((ATLAS_WIDTH, height), pygame.SRCALPHA)
+    for name, sprite in sprites.items():
+        # Blending onto the transparent atlas would darken soft edges, MAX copies the pixels as they are
+        image.blit(sprite, rects[name][:2], special_flags=pygame.BLEND_RGBA_MAX)
+    pygame.image.save(image, image_path)
+    with open(index_path, "w") as outfile:
+        json.dump({"version": ATLAS_VERSION, "image": os.path.basename(image_path), "sprites": rects},
+                  outfile, indent=1, sort_keys=True)
+    print(f"Packed {len(sprites)} sprites into {image_path} ({ATLAS_WIDTH}x{height})")
+
+
+if __name__ == "__main__":
+    build()
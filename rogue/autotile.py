@@ -0,0 +1,39 @@
+from typing import Optional
+
+import numpy as np
+
+from rogue.enums import IntTiles
+
+# Index of the plain floor image, right after the 256 wall bitmask images of ff.png
+FLOOR_TILE_INDEX = 256
+
+# (dx, dy) of every neighbour, in the order of its bit in the wall bitmask
+NEIGHBOUR_OFFSETS = (
+    (-1, -1), (0, -1), (1, -1),
+    (-1, 0), (1, 0),
+    (-1, 1), (0, 1), (1, 1),
+)
+
+
+def compute_autotile_indices(all_tiles: np.ndarray, window: Optional[tuple[slice, slice]] = None) -> np.ndarray:
+    """Return the tileset index of every cell, or of every cell in a window.
+
+    Walls get a bitmask of their wall neighbours (out of bounds counts as wall),
+    floors get FLOOR_TILE_INDEX.
+    """
+    map_width, map_height = all_tiles.shape
+    xs, ys = window if window is not None else (slice(0, map_width), slice(0, map_height))
+    width, height = xs.stop - xs.start, ys.stop - ys.start
+
+    # The window with a ring of its neighbours around it
+    walls = np.ones((width + 2, height + 2), dtype=bool, order="F")
+    x1, x2 = max(0, xs.start - 1), min(map_width, xs.stop + 1)
+    y1, y2 = max(0, ys.start - 1), min(map_height, ys.stop + 1)
+    walls[x1 - xs.start + 1:x2 - xs.start + 1, y1 - ys.start + 1:y2 - ys.start + 1] = (
+        all_tiles[x1:x2, y1:y2] == IntTiles.WALL)
+
+    indices = np.zeros((width, height), dtype=np.uint16, order="F")
+    for bit, (dx, dy) in enumerate(NEIGHBOUR_OFFSETS):
+        indices |= walls[1 + dx:1 + dx + width, 1 + dy:1 + dy + height].astype(np.uint16) << bit
+    indices[all_tiles[xs, ys] != IntTiles.WALL] = FLOOR_TILE_INDEX
+    return indices
@@ -0,0 +1,228 @@
+"""Benchmarks for the generation, FOV, pathing and rendering hot paths.
+
+python -m rogue.benchmark run --output bench_output.json
+python -m rogue.benchmark compare baseline.json bench_output.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np  # noqa: E402
+import pygame  # noqa: E402
+import tcod  # noqa: E402
+
+from rogue.enums import AIState, IntTiles  # noqa: E402
+from rogue.main import Game  # noqa: E402
+
+MAP_SIZES = [(40, 20), (120, 80), (300, 200)]
+ENEMY_COUNTS = [10, 100, 400]
+SEED = 1234
+
+
+def measure(fn: Callable[[], object], repeat: int, setup: Callable[[], object] = None) -> dict[str, float]:
+    """Time fn repeat times, setup runs before every call and is not timed."""
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "max": max(timings),
+        "repeat": repeat,
+    }
+
+
+def create_game(map_size: tuple[int, int], enemy_count: int = 0) -> Game:
+    # Enemy turns are timed where they run, not handed to the planner thread
+    game = Game(map_size=map_size, seed=SEED, threaded_ai=False)
+    tilemap = game.tilemap
+
+    # Top the enemies up to the requested count on random free floor tiles
+    rng = random.Random(SEED)
+    floor = list(zip(*np.nonzero(tilemap.all_tiles == IntTiles.FLOOR)))
+    rng.shuffle(floor)
+    for x, y in floor:
+        if len(tilemap.enemies) >= enemy_count:
+            break
+        if tilemap.occupancy.at(x, y) is None:
+            tilemap.spawn_enemy(game.enemy_group, (int(x), int(y)))
+    for enemy in tilemap.enemies:
+        enemy.ai_state = AIState.CHASING
+    return game
+
+
+def finish_enemy_movement(game: Game):
+    for enemy in game.tilemap.enemies:
+        if enemy.target_position is not None:
+            enemy.float_position = pygame.Vector2(enemy.target_position)
+            enemy.target_position = None
+    game.tilemap.scheduler.moving = 0
+
+
+def reset_dungeon(game: Game):
+    game.tilemap.rng = random.Random(SEED)
+    game.tilemap.all_tiles[:] = IntTiles.WALL
+    game.tilemap.rooms.clear()
+
+
+def run_benchmarks(repeat: int) -> dict[str, dict[str, float]]:
+    results = {}
+
+    def record(name: str, result: dict[str, float]):
+        results[name] = result
+        print(f"{name:<45} median {result['median'] * 1000:9.3f} ms  min {result['min'] * 1000:9.3f} ms")
+
+    # A fresh interpreter every time, so imports and asset loading are part of it
+    first_frame = [sys.executable, "-m", "rogue.main", "--first-frame", "--headless", "--seed", str(SEED)]
+    record("cold_start", measure(lambda: subprocess.run(first_frame, check=True, capture_output=True), repeat))
+
+    for size in MAP_SIZES:
+        label = f"{size[0]}x{size[1]}"
+        game = create_game(size)
+        tilemap = game.tilemap
+        record(f"generate_dungeon[{label}]",
+               measure(tilemap.generate_dungeon, repeat, setup=lambda: reset_dungeon(game)))
+        record(f"decide_tile_types[{label}]", measure(tilemap.decide_tile_types, repeat))
+        record(f"create_tiles[{label}]", measure(tilemap.create_tiles, repeat))
+
+        def update_fov():
+            tilemap.fov_origin = None
+            tilemap.fov_cache.clear()
+            tilemap.update_fov(game.player)
+
+        record(f"update_fov[{label}]", measure(update_fov, repeat))
+
+        # Dig out the wall closest to the player and build it again, with the room graph to keep up to date
+        px, py = game.player.tile_position
+        walls = np.argwhere(tilemap.all_tiles[1:-1, 1:-1] == IntTiles.WALL) + 1
+        wall_x, wall_y = min((tile for tile in walls.tolist() if tilemap.occupancy.at(*tile) is None),
+                             key=lambda tile: abs(tile[0] - px) + abs(tile[1] - py))
+        tilemap.find_path(game.player.tile_position, game.player.tile_position)
+
+        def dig_and_rebuild():
+            tilemap.set_tile(wall_x, wall_y, IntTiles.FLOOR)
+            tilemap.set_tile(wall_x, wall_y, IntTiles.WALL)
+
+        record(f"set_tile[{label}]", measure(dig_and_rebuild, repeat))
+        pygame.quit()
+
+        for enemy_count in ENEMY_COUNTS:
+            label = f"{size[0]}x{size[1]},{enemy_count}"
+            game = create_game(size, enemy_count)
+            player = game.player
+            farthest = max(game.tilemap.enemies, key=lambda en: en.simple_distance_to(player))
+            # A fresh portal search every time, as after every player move
+            record(f"get_path_to[{label}]",
+                   measure(lambda: farthest.get_path_to(*player.tile_position), repeat,
+                           setup=lambda: game.tilemap.room_graph and game.tilemap.room_graph.searches.clear()))
+            game.tilemap.use_room_graph = False
+            record(f"get_path_to_grid[{label}]",
+                   measure(lambda: farthest.get_path_to(*player.tile_position), repeat))
+            game.tilemap.use_room_graph = True
+            record(f"enemy_turn[{label}]",
+                   measure(lambda: game.enemy_turn(True), repeat, setup=lambda: finish_enemy_movement(game)))
+
+            def render():
+                game.update_world()
+                game.render_screen()
+
+            def force_full_redraw():
+                game.full_redraw = True
+
+            # A whole frame, as after the camera moved, and a frame only redrawing what changed since the last one
+            record(f"render_screen[{label}]", measure(render, repeat, setup=force_full_redraw))
+            record(f"render_screen_dirty[{label}]", measure(render, repeat))
+            pygame.quit()
+    return results
+
+
+def measure_memory() -> dict[str, dict[str, int]]:
+    """Return the bytes a map of every benchmarked size holds, per part."""
+    memory = {}
+    for size in MAP_SIZES:
+        label = f"{size[0]}x{size[1]}"
+        memory[label] = create_game(size).tilemap.memory_stats()
+        parts = "  ".join(f"{name} {nbytes / 1024:.1f} KiB" for name, nbytes in memory[label].items())
+        print(f"{f'memory[{label}]':<45} {parts}")
+        pygame.quit()
+    return memory
+
+
+def run(args: argparse.Namespace):
+    results = run_benchmarks(args.repeat)
+    memory = measure_memory()
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pygame": pygame.version.ver,
+            "numpy": np.__version__,
+            "tcod": tcod.__version__,
+            "seed": SEED,
+        },
+        "results": results,
+        "memory": memory,
+    }
+    with open(args.output, "w") as outfile:
+        json.dump(report, outfile, indent=2)
+    print(f"Results written to {args.output}")
+
+
+def compare(args: argparse.Namespace) -> int:
+    """Print the change of every benchmark against the baseline, return 1 if any regressed."""
+    with open(args.baseline) as infile:
+        baseline = json.load(infile)["results"]
+    with open(args.current) as infile:
+        current = json.load(infile)["results"]
+
+    regressions = 0
+    for name, result in current.items():
+        if name not in baseline:
+            print(f"{name:<45} new")
+            continue
+        ratio = result["median"] / baseline[name]["median"]
+        regressed = ratio > 1 + args.threshold
+        regressions += regressed
+        print(f"{name:<45} {baseline[name]['median'] * 1000:9.3f} ms -> {result['median'] * 1000:9.3f} ms"
+              f"  x{ratio:5.2f}{'  REGRESSION' if regressed else ''}")
+    print(f"{regressions} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the game's hot paths")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks and write the results as JSON")
+    run_parser.add_argument("--output", default="bench_output.json")
+    run_parser.add_argument("--repeat", type=int, default=5)
+
+    compare_parser = commands.add_parser("compare", help="flag regressions against a stored baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2,
+                                help="relative slowdown of the median that counts as a regression")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,18 +2,78 @@ from os.path import join
 
 import pygame
 
-from rogue.enums import AnimState
+from rogue.assets import load_image
+from rogue.atlas import frame_name, get_atlas
+from rogue.enums import AnimState, Direction
+
+
+class SpriteCache:
+    """Process-wide store of character frames, shared by every Animator.
+
+    Each (character, state, frame, facing) surface is loaded or flipped once.
+    """
+
+    state_folders = {
+        AnimState.IDLE: "idle",
+        AnimState.RUN: "run",
+    }
+
+    def __init__(self):
+        self.surfaces: dict[tuple[str, AnimState, int, Direction], pygame.surface.Surface] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, character_name: str, state: AnimState, frame: int,
+            facing: Direction = Direction.RIGHT) -> pygame.surface.Surface:
+        key = (character_name, state, frame, facing)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        if facing == Direction.LEFT:
+            surface = pygame.transform.flip(self.get(character_name, state, frame), True, False)
+        else:
+            atlas = get_atlas()
+            name = frame_name(character_name, self.state_folders[state], f"{character_name}_{frame+1}")
+            if atlas is not None and name in atlas:
+                surface = atlas.get(name)
+            else:
+                surface = load_image(
+                    join("resources", "character", character_name, self.state_folders[state],
+                         f"{character_name}_{frame+1}.png"))
+        self.surfaces[key] = surface
+        return surface
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "surfaces": len(self.surfaces),
+            "bytes": sum(s.get_width() * s.get_height() * s.get_bytesize() for s in self.surfaces.values()),
+        }
+
+    def clear(self):
+        self.surfaces.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+sprite_cache = SpriteCache()
 
 
 class Animator:
     def __init__(self, character_name: str, anim_frame_length: float = 0.08, animation_length: int = 4):
         self.char_name = character_name
         self.anim_len = animation_length
+        # Both facings are resolved up front, so flipping never happens per frame
         self.states = {
-            AnimState.IDLE: [pygame.image.load(
-                join("resources", "character", character_name, "idle", f"{character_name}_{i+1}.png")).convert_alpha() for i in range(self.anim_len)],
-            AnimState.RUN: [pygame.image.load(
-                join("resources", "character", character_name, "run", f"{character_name}_{i+1}.png")).convert_alpha() for i in range(self.anim_len)]
+            facing: {
+                state: [sprite_cache.get(character_name, state, i, facing) for i in range(self.anim_len)]
+                for state in SpriteCache.state_folders
+            }
+            for facing in (Direction.RIGHT, Direction.LEFT)
         }
         self.anim_idx = 0
         self.anim_timer = 0
@@ -21,8 +81,10 @@ class Animator:
         self.current_state = AnimState.IDLE
         self.next_queued_animation = AnimState.NONE
 
-    def get_current_image(self) -> pygame.surface.Surface:
-        return self.states[self.current_state][self.anim_idx]
+    def get_current_image(self, facing: Direction = Direction.RIGHT) -> pygame.surface.Surface:
+        if facing != Direction.LEFT:
+            facing = Direction.RIGHT
+        return self.states[facing][self.current_state][self.anim_idx]
 
     def update_state(self, state: AnimState):
         if state != self.current_state:
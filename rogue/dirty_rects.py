@@ -0,0 +1,40 @@
+import pygame
+
+# Past this many changed sprites a full redraw is cheaper than redrawing each area
+MAX_DIRTY_RECTS = 32
+
+
+class DirtyRects:
+    """Where every sprite was last drawn on screen, and with which image.
+
+    changes() compares that against the sprites' new placements and returns the
+    screen areas that need to be redrawn. A sprite that shows the same image at
+    the same spot costs nothing.
+    """
+
+    def __init__(self):
+        self.drawn: dict[pygame.sprite.Sprite, tuple[pygame.surface.Surface, pygame.rect.Rect]] = {}
+        self.camera_position = None
+
+    def reset(self, placements: list[tuple[pygame.sprite.Sprite, pygame.surface.Surface, pygame.rect.Rect]],
+              camera_position: pygame.Vector2):
+        """Remember the placements of a full redraw."""
+        self.drawn = {sprite: (image, rect) for sprite, image, rect in placements}
+        self.camera_position = pygame.Vector2(camera_position)
+
+    def changes(self, placements: list[tuple[pygame.sprite.Sprite, pygame.surface.Surface, pygame.rect.Rect]]
+                ) -> list[pygame.rect.Rect]:
+        """Return the areas covering the old and new spot of every sprite that changed, then remember the new ones."""
+        dirty = []
+        drawn = {}
+        for sprite, image, rect in placements:
+            drawn[sprite] = (image, rect)
+            previous = self.drawn.pop(sprite, None)
+            if previous is not None and previous[0] is image and previous[1] == rect:
+                continue
+            dirty.append(rect if previous is None else rect.union(previous[1]))
+        # Whatever is left was removed or culled since the last frame
+        for image, rect in self.drawn.values():
+            dirty.append(rect)
+        self.drawn = drawn
+        return dirty
@@ -1,4 +1,4 @@
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 import numpy as np
 import pygame
@@ -6,8 +6,9 @@ import tcod
 
 from rogue.components.animator import Animator
 from rogue.components.health_bar import HealthBar
-from rogue.entity import Entity
+from rogue.entity import WALK_SPEED, Entity, walk_towards
 from rogue.enums import AIRoundState, AIState, AnimState, Direction, TileState
+from rogue.scheduler import NORMAL_SPEED
 
 
 class Enemy(Entity):
@@ -31,22 +32,26 @@ class Enemy(Entity):
         self.ai_state = AIState.IDLE
         self.round_state = AIRoundState.DONE
 
+        # Set when movement and animation are advanced by an ActorStore instead of update()
+        self.actor_store = None
+        self.store_index = -1
+
+        # Energy gained per player turn, NORMAL_SPEED acts once every turn
+        self.speed = NORMAL_SPEED
+        # Pixels per second while walking to the target tile
+        self.walk_speed = WALK_SPEED
+        # Set by the TileMap, counts this enemy while it is moving
+        self.scheduler = None
+
     def get_path_to(self, dest_x: int, dest_y: int) -> List[Tuple[int, int]]:
         """Compute and return a path to the target position.
 
-        If there is no valid path then returns an empty list.
+        If there is no valid path then returns an empty list. On a map using its room
+        graph the path only leads up to the next waypoint.
         """
-        # Copy the walkable array.
-        cost = np.array(self.map_ref.all_tiles, dtype=np.int8)
-
-        for entity in self.map_ref.entities:
-            # Check that an enitiy blocks movement and the cost isn't zero (blocking.)
-            if entity.blocks_movement and cost[entity.tile_position[0], entity.tile_position[1]]:
-                # Add to the cost of a blocked position.
-                # A lower number means more enemies will crowd behind each other in
-                # hallways.  A higher number means enemies will take longer paths in
-                # order to surround the player.
-                cost[entity.tile_position[0], entity.tile_position[1]] += 10
+        if self.map_ref.use_room_graph:
+            return self.map_ref.find_path(self.tile_position, (dest_x, dest_y))
+        cost = self.map_ref.get_cost_map()
 
         # Create a graph from the cost array and pass that graph to a new pathfinder.
         graph = tcod.path.SimpleGraph(cost=cost, cardinal=2, diagonal=0)
@@ -61,6 +66,13 @@ class Enemy(Entity):
         # Convert from List[List[int]] to List[Tuple[int, int]].
         return [(index[0], index[1]) for index in path]
 
+    def get_next_step(self) -> Optional[Tuple[int, int]]:
+        """Return the next tile towards the player, None if the player can't be reached."""
+        if self.map_ref.use_flow_field:
+            return self.map_ref.flow_step(self.tile_position)
+        path = self.get_path_to(self.player_ref.tile_position[0], self.player_ref.tile_position[1])
+        return path[0] if path else None
+
     def update_state(self):
         if self.ai_state == AIState.IDLE:
             visible = self.map_ref.tilemap_states[self.tile_position[0]][self.tile_position[1]]
@@ -75,17 +87,20 @@ class Enemy(Entity):
         # if self.round_state == AIRoundState.DONE:
         #     return
 
-        path = self.get_path_to(self.player_ref.tile_position[0], self.player_ref.tile_position[1])
-        if path:
+        next_step = self.get_next_step()
+        if next_step:
             distance = self.simple_distance_to(self.player_ref)
             if distance == 1:
                 print("Minion attacked you!")
             else:
-                for en in self.map_ref.enemies:
-                    if en.tile_position == (path[0][0], path[0][1]):
-                        return
-                self.target_position = (path[0][0]*16, path[0][1]*16)
-                self.tile_position = (path[0][0], path[0][1])
+                if self.map_ref.occupancy.at(*next_step) is not None:
+                    return
+                self.target_position = (next_step[0]*16, next_step[1]*16)
+                self.tile_position = next_step
+                if self.scheduler is not None:
+                    self.scheduler.started_moving()
+                if self.actor_store is not None:
+                    self.actor_store.set_target(self.store_index, self.target_position)
         else:
             self.target_position = None
 
@@ -96,11 +111,12 @@ class Enemy(Entity):
         self.animator.update(dt)
         if self.target_position:
             direction = self.float_position - pygame.Vector2(self.target_position[0], self.target_position[1])
-            if abs(direction.length()) > 1:
+            step = self.walk_speed * dt
+            if abs(direction.length()) > step:
                 self.round_state = AIRoundState.MOVING
                 self.animator.update_state(AnimState.RUN)
                 pos = direction.normalize()
-                self.float_position -= pos
+                self.float_position -= pos * step
                 if pos.x > 0:  # Facing left
                     self.facing_direction = Direction.LEFT
                 else:
@@ -110,17 +126,20 @@ class Enemy(Entity):
                 self.round_state = AIRoundState.DONE
                 self.animator.queue_next_animation(AnimState.IDLE)
                 self.target_position = None
+                if self.scheduler is not None:
+                    self.scheduler.finished_moving()
             self.rect.x = self.float_position.x
             self.rect.y = self.float_position.y
             self.health_bar.update_based_on_parent_pos(self.rect)
 
+        # Enemies on hidden tiles are culled when drawing, so their image can stay as it is
         if map_state[self.tile_position[0]][self.tile_position[1]] == TileState.VISIBLE:
-            self.image = self.animator.get_current_image()
-            # Flip if moving left
-            if self.facing_direction == Direction.LEFT:
-                self.image = pygame.transform.flip(self.image, True, False)
-        else:
-            self.image = pygame.Surface((0, 0))
+            self.image = self.animator.get_current_image(self.facing_direction)
+
+    def render_position(self, lead: float) -> pygame.Vector2:
+        if self.target_position is None:
+            return self.float_position
+        return walk_towards(self.float_position, pygame.Vector2(self.target_position), self.walk_speed * lead)
 
     def move(self):
         self.update_state()
@@ -4,17 +4,46 @@ import pygame
 
 from rogue.enums import Direction
 
+# Pixels per second an entity walks, one pixel per simulation tick at 60 ticks per second
+WALK_SPEED = 60
+
+
+def walk_towards(position: pygame.Vector2, target: pygame.Vector2, distance: float) -> pygame.Vector2:
+    """Return position moved distance closer to target, or target itself if it is no further away."""
+    direction = target - position
+    if direction.length() > distance:
+        return position + direction.normalize() * distance
+    return pygame.Vector2(target)
+
 
 class Entity(pygame.sprite.Sprite):
     def __init__(self, group: pygame.sprite.Group, blocks_movement: bool, starting_position: Tuple[int, int]):
         super().__init__(group)
         self.blocks_movement = blocks_movement
 
+        # Set when registered in a TileMap's OccupancyGrid
+        self.occupancy = None
+        self.occupancy_id = -1
+
         self.float_position = pygame.Vector2(starting_position[0] * 16, starting_position[1] * 16)
         self.tile_position = starting_position
 
         self.facing_direction = Direction.RIGHT
 
+    @property
+    def tile_position(self) -> Tuple[int, int]:
+        return self._tile_position
+
+    @tile_position.setter
+    def tile_position(self, value: Tuple[int, int]):
+        if self.occupancy is not None:
+            self.occupancy.move(self, self._tile_position, value)
+        self._tile_position = value
+
+    def render_position(self, lead: float) -> pygame.Vector2:
+        """Return where the entity will be lead seconds after the last tick, drawn between ticks."""
+        return self.float_position
+
     def simple_distance_to(self, target: Self):
         dx = target.tile_position[0] - self.tile_position[0]
         dy = target.tile_position[1] - self.tile_position[1]
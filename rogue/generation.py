@@ -0,0 +1,105 @@
+import random
+
+import numpy as np
+
+from rogue.autotile import compute_autotile_indices
+from rogue.enums import IntTiles, Tiles
+from rogue.rect_room import RectangularRoom
+
+# Bump whenever a change makes the same seed produce a different level, so cached levels are regenerated
+GENERATOR_VERSION = 1
+
+
+class LevelData:
+    """Everything that defines a generated floor, without any pygame objects."""
+
+    def __init__(self, size: tuple[int, int], seed: int, all_tiles: np.ndarray, tile_indices: np.ndarray,
+                 rooms: list[RectangularRoom], player_position: tuple[int, int],
+                 spawn_points: list[tuple[int, int]]):
+        self.size = size
+        self.seed = seed
+        self.all_tiles = all_tiles
+        self.tile_indices = tile_indices
+        self.rooms = rooms
+        self.player_position = player_position
+        self.spawn_points = spawn_points
+        # The floor's RoomGraph when it was built along with the level, see prepare_level
+        self.room_graph = None
+
+
+def carve_tunnel(all_tiles: np.ndarray, start: tuple[int, int], end: tuple[int, int], rng: random.Random):
+    """Dig an L-shaped tunnel between these two points, one slice write per leg."""
+    x1, y1 = start
+    x2, y2 = end
+    if rng.random() < 0.5:  # 50% chance.
+        # Move horizontally, then vertically.
+        corner_x, corner_y = x2, y1
+    else:
+        # Move vertically, then horizontally.
+        corner_x, corner_y = x1, y2
+
+    # Both legs are axis aligned, so each one is a single row or column slice.
+    all_tiles[min(x1, corner_x):max(x1, corner_x) + 1, min(y1, corner_y):max(y1, corner_y) + 1] = Tiles.FLOOR.value
+    all_tiles[min(corner_x, x2):max(corner_x, x2) + 1, min(corner_y, y2):max(corner_y, y2) + 1] = Tiles.FLOOR.value
+
+
+def generate_dungeon(all_tiles: np.ndarray, rng: random.Random, max_rooms: int = 50,
+                     room_min_size: int = 3, room_max_size: int = 6) -> tuple[list[RectangularRoom], tuple[int, int]]:
+    """Carve rooms and tunnels into all_tiles, return the rooms and the player's starting position.
+
+    Overlap checks go through a mask of the area every room claims, so each attempt
+    costs the area of the room instead of a pass over all rooms placed so far.
+    """
+    size = all_tiles.shape
+    rooms: list[RectangularRoom] = []
+    player_position = (0, 0)
+    # Rooms claim their closed bounds, which is exactly what RectangularRoom.intersects tests
+    claimed = np.zeros(size, dtype=bool, order="F")
+    for _ in range(max_rooms):
+        room_width = rng.randint(room_min_size, room_max_size)
+        room_height = rng.randint(room_min_size, room_max_size)
+
+        x = rng.randint(1, size[0] - room_width - 1)
+        y = rng.randint(1, size[1] - room_height - 1)
+
+        new_room = RectangularRoom(x, y, room_width, room_height)
+        bounds = (slice(new_room.x1, new_room.x2 + 1), slice(new_room.y1, new_room.y2 + 1))
+        if claimed[bounds].any():
+            continue
+
+        claimed[bounds] = True
+        new_room.block(all_tiles)
+
+        if len(rooms) == 0:
+            # The first room, where the player starts.
+            player_position = new_room.center
+        else:  # All rooms after the first.
+            # Dig out a tunnel between this room and the previous one.
+            carve_tunnel(all_tiles, rooms[-1].center, new_room.center, rng)
+
+        rooms.append(new_room)
+    return rooms, player_position
+
+
+def generate_spawn_points(rooms: list[RectangularRoom], rng: random.Random,
+                          player_position: tuple[int, int]) -> list[tuple[int, int]]:
+    """Pick at most one enemy position per room, never on the player or another enemy."""
+    taken = {player_position}
+    spawn_points = []
+    for c_room in rooms:
+        position = (rng.randint(c_room.x1, c_room.x2 - 1), rng.randint(c_room.y1, c_room.y2 - 1))
+        if position in taken:
+            continue
+        taken.add(position)
+        spawn_points.append(position)
+    return spawn_points
+
+
+def generate_level(size: tuple[int, int], seed: int, max_rooms: int = 50,
+                   room_min_size: int = 3, room_max_size: int = 6) -> LevelData:
+    """Generate a whole floor, the same seed always gives the same floor."""
+    rng = random.Random(seed)
+    all_tiles = np.full(size, fill_value=IntTiles.WALL, dtype=np.int8, order="F")
+    rooms, player_position = generate_dungeon(all_tiles, rng, max_rooms, room_min_size, room_max_size)
+    spawn_points = generate_spawn_points(rooms, rng, player_position)
+    return LevelData(size, seed, all_tiles, compute_autotile_indices(all_tiles), rooms, player_position, spawn_points)
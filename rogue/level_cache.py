@@ -0,0 +1,65 @@
+import hashlib
+import os
+from os.path import join
+from typing import Optional
+
+import numpy as np
+
+from rogue.generation import GENERATOR_VERSION, LevelData
+from rogue.rect_room import RectangularRoom
+
+
+class LevelCache:
+    """Generated levels stored as uncompressed .npz files, keyed by size, seed and generator parameters.
+
+    Entries written by another GENERATOR_VERSION are treated as missing and overwritten.
+    """
+
+    def __init__(self, directory: str = ".level_cache"):
+        self.directory = directory
+
+    def path(self, size: tuple[int, int], seed: int, **params) -> str:
+        key = repr((tuple(size), seed, sorted(params.items())))
+        return join(self.directory, f"{size[0]}x{size[1]}_{seed}_{hashlib.sha1(key.encode()).hexdigest()[:12]}.npz")
+
+    def contains(self, size: tuple[int, int], seed: int, **params) -> bool:
+        """Return whether a level of the current GENERATOR_VERSION is stored, reading only its version."""
+        path = self.path(size, seed, **params)
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as data:
+            return int(data["version"]) == GENERATOR_VERSION
+
+    def load(self, size: tuple[int, int], seed: int, **params) -> Optional[LevelData]:
+        path = self.path(size, seed, **params)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            if int(data["version"]) != GENERATOR_VERSION:
+                return None
+            rooms = [RectangularRoom(x1, y1, x2 - x1, y2 - y1) for x1, y1, x2, y2 in data["rooms"].tolist()]
+            return LevelData(
+                size=tuple(size),
+                seed=seed,
+                all_tiles=np.asfortranarray(data["all_tiles"]),
+                tile_indices=np.asfortranarray(data["tile_indices"]),
+                rooms=rooms,
+                player_position=tuple(data["player_position"].tolist()),
+                spawn_points=[tuple(point) for point in data["spawn_points"].tolist()],
+            )
+
+    def save(self, level: LevelData, **params):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(level.size, level.seed, **params)
+        # Write to a temporary file first so a crash never leaves a truncated entry behind
+        temporary_path = path + ".tmp.npz"
+        np.savez(
+            temporary_path,
+            version=np.int32(GENERATOR_VERSION),
+            all_tiles=level.all_tiles,
+            tile_indices=level.tile_indices,
+            rooms=np.array([(r.x1, r.y1, r.x2, r.y2) for r in level.rooms], dtype=np.int32).reshape(-1, 4),
+            player_position=np.array(level.player_position, dtype=np.int32),
+            spawn_points=np.array(level.spawn_points, dtype=np.int32).reshape(-1, 2),
+        )
+        os.replace(temporary_path, path)
@@ -1,30 +1,144 @@
+import argparse
+import os
+import random
+import time
+from typing import Callable
+
+import numpy as np
 import pygame
 
-from rogue.enums import AIRoundState, Direction
+from rogue.dirty_rects import MAX_DIRTY_RECTS, DirtyRects
+from rogue.enums import Direction, TileState
+from rogue.generation import LevelData
+from rogue.level_cache import LevelCache
 from rogue.map import TileMap
+from rogue.planner import AIPlanner
 from rogue.player import Player
+from rogue.prefetch import LevelPrefetcher
+from rogue.profiler import FrameProfiler
+from rogue.replay import InputLog, InputRecorder, Replay
+from rogue.snapshot import Autosaver, capture, read, restore, write
+from rogue.tile_layer import BACKGROUND_COLOR
+from rogue.world import StreamedTileMap
+
+# The turn logic and movement always advance in ticks of this length, whatever the frame rate
+SIMULATION_RATE = 60
+TICK = 1 / SIMULATION_RATE
+# A longer stall than this many ticks slows the game down instead of being caught up
+MAX_TICKS_PER_FRAME = 8
+
+FRAME_PHASES = ["autosave", "input", "enemy_turn", "player_update", "fov", "enemy_update",
+                "tile_update", "tile_draw", "entity_draw", "flip"]
+
+
+class RandomWalkInput:
+    """Scripted input source that picks a random direction every frame."""
+
+    def __init__(self, seed: int = None):
+        self.rng = random.Random(seed)
+        self.directions = [Direction.UP, Direction.RIGHT, Direction.DOWN, Direction.LEFT]
+
+    def __call__(self) -> Direction:
+        return self.rng.choice(self.directions)
 
 
 class Game:
-    def __init__(self):
+    def __init__(self, headless: bool = False, input_source: Callable[[], Direction] = None,
+                 map_size: tuple[int, int] = (40, 20), use_actor_store: bool = False, seed: int = None,
+                 level_cache: LevelCache = None, max_rooms: int = 50, streamed: bool = False,
+                 autosave_interval: int = 0, dirty_rendering: bool = True, threaded_ai: bool = True,
+                 room_graph_pathing: bool = False):
+        self.created_at = time.perf_counter()
+        # Seconds from construction to the end of the first rendered frame
+        self.first_frame_time = None
+        self.headless = headless
+        if headless:
+            # Never open a window, not even a hidden one
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
         pygame.init()
         self.screen_size = pygame.Vector2(640, 320)
         self.tilemap_size = (16, 16)
-        self.screen_tile_size = (40, 20)
+        self.screen_tile_size = map_size
 
-        self.screen = pygame.display.set_mode(
-            self.screen_size, flags=(pygame.SCALED | pygame.FULLSCREEN), vsync=1
-        )
+        if headless:
+            self.screen = pygame.Surface(self.screen_size)
+        else:
+            self.screen = pygame.display.set_mode(
+                self.screen_size, flags=(pygame.SCALED | pygame.FULLSCREEN), vsync=1
+            )
         self.clock = pygame.time.Clock()
         self.running = True
         self.dt = 0
 
+        self.input_source = input_source or self.read_keyboard
+        self.turn = 0
+
+        self.debug = False
+        self.debug_layer = pygame.Surface(self.screen_size, pygame.SRCALPHA)
+        self.debug_font = None
+        # Only redraw and present the screen areas whose sprites changed, unless the whole picture moved
+        self.dirty_rendering = dirty_rendering
+        self.dirty_rects = DirtyRects()
+        self.full_redraw = True
+        # F3 toggles the debug view and timing overlay, F9 dumps frame times, F10 profiles the next frames
+        self.profiler = FrameProfiler(FRAME_PHASES)
+        self.profile_frames = 300
+
+        self.use_actor_store = use_actor_store
+        self.level_cache = level_cache
+        self.max_rooms = max_rooms
+        # An endless floor streamed in chunks instead of a fixed map_size one
+        self.streamed = streamed
+        # Every floor's seed is derived from this one
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.floor = 0
+        # Enemies path over the room graph instead of a flow field, fixed size floors only.
+        # The graph is built with every floor, for the next one in the prefetch worker
+        self.room_graph_pathing = room_graph_pathing and not streamed
+        self.prefetcher = LevelPrefetcher(level_cache, room_graph=self.room_graph_pathing)
+        # Saves every autosave_interval turns in the background, 0 disables it. F5 saves, F6 loads
+        self.autosave_interval = autosave_interval
+        self.autosaver = Autosaver() if autosave_interval and not streamed else None
+        self.save_path = "savegame.npz"
+        # Plans enemy turns on a worker thread instead of in the frame that follows the player's move
+        self.planner = AIPlanner() if threaded_ai else None
+        # Set to record the session's input, or to play a recorded one back instead of reading input
+        self.recorder: InputRecorder = None
+        self.replay: Replay = None
+        self.start_floor()
+
+    def settings(self) -> dict:
+        """Return the arguments that start this game again the same way."""
+        return {
+            "map_size": list(self.screen_tile_size),
+            "use_actor_store": self.use_actor_store,
+            "seed": self.seed,
+            "max_rooms": self.max_rooms,
+            "streamed": self.streamed,
+            "threaded_ai": self.planner is not None,
+            "room_graph_pathing": self.room_graph_pathing,
+        }
+
+    def floor_seed(self, floor: int) -> int:
+        if floor == 0:
+            return self.seed
+        return random.Random(f"{self.seed}:{floor}").randrange(2 ** 32)
+
+    def start_floor(self, level: LevelData = None):
         self.waiting_to_finish_movement = False
+        if self.planner is not None:
+            self.planner.discard()
 
         self.player_group = pygame.sprite.Group()
         self.enemy_group = pygame.sprite.Group()
 
-        self.tilemap = TileMap(self.screen_tile_size, self.enemy_group)
+        if self.streamed:
+            self.tilemap = StreamedTileMap(self.enemy_group, self.use_actor_store, self.floor_seed(self.floor),
+                                           max_rooms=self.max_rooms)
+        else:
+            self.tilemap = TileMap(self.screen_tile_size, self.enemy_group, self.use_actor_store,
+                                   self.floor_seed(self.floor), self.level_cache, level, self.max_rooms,
+                                   room_graph_pathing=self.room_graph_pathing)
 
         self.player = Player(
             self.player_group, self.tilemap.player_position, self.tilemap
@@ -37,55 +151,192 @@ class Game:
             self.screen.height / 2 - self.player.float_position.y,
         )
 
-        self.debug = False
         self.tilemap.update_fov(self.player)
+        self.tilemap.tile_layer.update(self.tilemap.tilemap_states)
+        self.full_redraw = True
 
-    def render_screen(self):
-        # fill the screen with a color to wipe away anything from last frame
-        self.screen.fill((13, 13, 13))
-        draw_surf = pygame.Surface(self.screen_size, pygame.SRCALPHA)
-        self.player_group.update(self.dt)
-        self.tilemap.update_fov(self.player)
-        self.tilemap.tiles_group.update(self.tilemap.tilemap_states)
-        self.tilemap.tiles_group.draw(draw_surf)
-        self.enemy_group.update(self.dt, self.tilemap.tilemap_states)
-        self.enemy_group.draw(draw_surf)
-        # self.player_group.draw(self.screen)
-
-        if self.debug:
-            for ent in self.tilemap.entities:
-                pygame.draw.rect(
-                    draw_surf, pygame.color.Color(0, 255, 0, 50), ent.rect, 1
-                )
-            for room in self.tilemap.rooms:
-                pygame.draw.rect(
-                    draw_surf,
-                    (255, 0, 0, 50),
-                    pygame.rect.Rect(
-                        room.x1 * 16,
-                        room.y1 * 16,
-                        (room.x2 - room.x1) * 16,
-                        (room.y2 - room.y1) * 16,
-                    ),
-                    1,
-                )
+    def prefetch_next_floor(self):
+        if self.streamed:
+            return
+        self.prefetcher.prefetch(self.screen_tile_size, self.floor_seed(self.floor + 1),
+                                 **self.tilemap.generation_params)
+
+    def next_floor(self):
+        """Move to the next floor, waiting for its prefetch if it is not finished yet."""
+        self.floor += 1
+        if self.streamed:
+            self.start_floor()
+            return
+        self.start_floor(self.prefetcher.get(self.screen_tile_size, self.floor_seed(self.floor),
+                                             **self.tilemap.generation_params))
+        self.prefetch_next_floor()
+
+    def save_game(self, path: str):
+        if self.streamed:
+            print("Streamed floors can't be saved")
+            return
+        write(capture(self), path)
+        print(f"Game saved to {path}")
+
+    def load_game(self, path: str):
+        if self.streamed:
+            # A snapshot holds a fixed size map, it can't be restored into the streamed window
+            print("Saved games can't be loaded into a streamed floor")
+            return
+        if not os.path.exists(path):
+            print(f"No saved game at {path}")
+            return
+        restore(self, read(path))
+        # The loaded floor can be another one than the prefetched, descending shouldn't block on it
+        self.prefetch_next_floor()
+        print(f"Game loaded from {path}")
+
+    def update_world(self):
+        with self.profiler.phase("player_update"):
+            self.player_group.update(self.dt)
+        with self.profiler.phase("fov"):
+            self.tilemap.update_fov(self.player)
+        with self.profiler.phase("enemy_update"):
+            if self.tilemap.actor_store is not None:
+                self.tilemap.actor_store.step(self.dt, self.tilemap.tilemap_states)
+            else:
+                self.enemy_group.update(self.dt, self.tilemap.tilemap_states)
+
+    def shown_enemies(self) -> list:
+        """Return the enemies on visible tiles inside the camera, culled with one vectorized mask."""
+        store = self.tilemap.actor_store
+        if store is not None:
+            enemies = store.actors
+            n = store.count
+            tiles = (np.where(store.has_target[:n, None], store.target[:n], store.position[:n]) // 16).astype(np.intp)
+        else:
+            enemies = self.tilemap.enemies
+            tiles = np.array([enemy.tile_position for enemy in enemies], dtype=np.intp).reshape(-1, 2)
+        if not len(tiles):
+            return []
+
+        # A walking enemy is at most a tile away from the tile it walks to, its health bar sits above it
+        x = tiles[:, 0] * 16 + self.camera_position.x
+        y = tiles[:, 1] * 16 + self.camera_position.y
+        on_screen = (x > -32) & (x < self.screen.width + 16) & (y > -32) & (y < self.screen.height + 19)
+        visible = self.tilemap.tilemap_states[tiles[:, 0], tiles[:, 1]] == TileState.VISIBLE
+        return [enemies[i] for i in np.nonzero(on_screen & visible)[0].tolist()]
+
+    def sprite_placements(self, lead: float = 0.0
+                          ) -> list[tuple[pygame.sprite.Sprite, pygame.surface.Surface, pygame.rect.Rect]]:
+        """Return every sprite that is shown in drawing order with its image and where that lands on screen.
+
+        Walking enemies are placed where they will be lead seconds after the last tick.
+        """
+        placements = []
+        camera_x, camera_y = self.camera_position
+        for enemy in self.shown_enemies():
+            rect = enemy.rect
+            if lead and enemy.target_position is not None:
+                rect = rect.copy()
+                rect.topleft = enemy.render_position(lead)
+            x, y = rect[0] + camera_x, rect[1] + camera_y
+            placements.append((enemy, enemy.image, enemy.image.get_rect(topleft=(x, y))))
+            bar = enemy.health_bar
+            x, y = rect[0] + bar.offset.x + camera_x, rect[1] + bar.offset.y + camera_y
+            placements.append((bar, bar.image, bar.image.get_rect(topleft=(x, y))))
+        player_position = (self.screen.width / 2, self.screen.height / 2 - 16)
+        placements.append((self.player, self.player.image, self.player.image.get_rect(topleft=player_position)))
+        return placements
+
+    def render_screen(self, lead: float = 0.0):
+        """Draw the frame, with the walking entities lead seconds further than the last tick left them."""
+        with self.profiler.phase("tile_update"):
+            rebaked = False
+            if self.tilemap.fov_changed is not None:
+                rebaked = bool(self.tilemap.tile_layer.update(self.tilemap.tilemap_states, self.tilemap.fov_changed))
+                self.tilemap.fov_changed = None
+            if self.tilemap.tile_layer.stale_chunks:
+                rebaked = bool(self.tilemap.tile_layer.bake_stale(self.tilemap.tilemap_states)) or rebaked
+        player_rect = self.player.rect
+        if lead and self.player.moving:
+            player_rect = player_rect.copy()
+            player_rect.topleft = self.player.render_position(lead)
         self.camera_position = pygame.Vector2(
-            self.screen.width / 2 - self.player.rect.x,
-            self.screen.height / 2 - self.player.rect.y,
-        )
-        self.screen.blit(draw_surf, self.camera_position)
-        self.screen.blit(
-            self.player.image, (self.screen.width / 2, self.screen.height / 2 - 16)
+            self.screen.width / 2 - player_rect.x,
+            self.screen.height / 2 - player_rect.y,
         )
+        placements = self.sprite_placements(lead)
 
-        # self.screen.blit(self.player.image, self.player.rect.topleft - pygame.Vector2(0, 16))
-        pygame.display.flip()
+        # Anything that moves the whole picture needs a full redraw, otherwise only the sprites that changed
+        full_redraw = (not self.dirty_rendering or self.full_redraw or self.debug or rebaked
+                       or self.camera_position != self.dirty_rects.camera_position)
+        dirty = None
+        if not full_redraw:
+            dirty = self.dirty_rects.changes(placements)
+            if len(dirty) > MAX_DIRTY_RECTS:
+                full_redraw = True
 
-    def handle_input(self):
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                self.running = False
+        if full_redraw:
+            self.draw_area(self.screen.get_rect(), placements)
+            if self.debug:
+                self.draw_debug()
+                self.profiler.draw_overlay(self.screen)
+            self.dirty_rects.reset(placements, self.camera_position)
+            self.full_redraw = False
+        else:
+            for area in dirty:
+                self.screen.set_clip(area)
+                self.draw_area(area, placements)
+            self.screen.set_clip(None)
 
+        with self.profiler.phase("flip"):
+            if not self.headless:
+                if full_redraw:
+                    pygame.display.flip()
+                elif dirty:
+                    pygame.display.update(dirty)
+        if self.first_frame_time is None:
+            self.first_frame_time = time.perf_counter() - self.created_at
+
+    def draw_area(self, area: pygame.rect.Rect,
+                  placements: list[tuple[pygame.sprite.Sprite, pygame.surface.Surface, pygame.rect.Rect]]):
+        """Redraw the terrain and the sprites overlapping a screen area, the screen clip limits the tiles."""
+        with self.profiler.phase("tile_draw"):
+            # fill the screen with a color to wipe away anything from last frame
+            self.screen.fill(BACKGROUND_COLOR, area)
+            self.tilemap.tile_layer.draw(self.screen, self.camera_position)
+        with self.profiler.phase("entity_draw"):
+            if area == self.screen.get_rect():
+                self.screen.fblits([(image, rect) for _, image, rect in placements])
+            else:
+                self.screen.fblits([(image, rect) for _, image, rect in placements if rect.colliderect(area)])
+
+    def draw_debug(self):
+        self.debug_layer.fill((0, 0, 0, 0))
+        offset = (int(self.camera_position.x), int(self.camera_position.y))
+        for ent in self.tilemap.entities:
+            pygame.draw.rect(
+                self.debug_layer, pygame.color.Color(0, 255, 0, 50), ent.rect.move(offset), 1
+            )
+        for room in self.tilemap.rooms:
+            pygame.draw.rect(
+                self.debug_layer,
+                (255, 0, 0, 50),
+                pygame.rect.Rect(
+                    room.x1 * 16 + offset[0],
+                    room.y1 * 16 + offset[1],
+                    (room.x2 - room.x1) * 16,
+                    (room.y2 - room.y1) * 16,
+                ),
+                1,
+            )
+        self.screen.blit(self.debug_layer, (0, 0))
+
+        if not self.streamed:
+            if self.debug_font is None:
+                self.debug_font = pygame.font.Font(None, 14)
+            state, elapsed = self.prefetcher.progress(self.screen_tile_size, self.floor_seed(self.floor + 1),
+                                                      **self.tilemap.generation_params)
+            text = self.debug_font.render(f"next floor: {state} {elapsed:.1f}s", True, (230, 230, 230))
+            self.screen.blit(text, text.get_rect(bottomleft=(4, self.screen.height - 4)))
+
+    def read_keyboard(self) -> Direction:
         keys = pygame.key.get_pressed()
         player_movement_direction = Direction.NULL
         if keys[pygame.K_d]:
@@ -96,46 +347,266 @@ class Game:
             player_movement_direction = Direction.DOWN
         if keys[pygame.K_w]:
             player_movement_direction = Direction.UP
+        return player_movement_direction
+
+    def read_events(self) -> list[int]:
+        """Handle the window events and return the keys pressed since the last call."""
+        keys = []
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.running = False
+            elif event.type == pygame.KEYDOWN:
+                keys.append(event.key)
+        return keys
 
-        return self.player.move(player_movement_direction)
+    def handle_key(self, key: int):
+        if key == pygame.K_F3:
+            self.debug = not self.debug
+            self.full_redraw = True
+        elif key == pygame.K_F9:
+            self.profiler.dump_csv()
+        elif key == pygame.K_F10:
+            self.profiler.capture_profile(self.profile_frames)
+        elif key == pygame.K_PERIOD:
+            self.next_floor()
+        elif key == pygame.K_F5:
+            self.save_game(self.save_path)
+        elif key == pygame.K_F6:
+            self.load_game(self.save_path)
+
+    def handle_input(self):
+        keys = self.read_events() if not self.headless else []
+        if self.replay is not None:
+            # Saving and loading reach outside the session, a replay must not depend on what is on disk
+            keys = [key for key in self.replay.keys() if key not in (pygame.K_F5, pygame.K_F6)]
+        elif self.recorder is not None and pygame.K_F6 in keys:
+            print("Saved games can't be loaded while recording")
+            keys = [key for key in keys if key != pygame.K_F6]
+        for key in keys:
+            self.handle_key(key)
+
+        direction = self.replay.direction() if self.replay is not None else self.input_source()
+        if self.recorder is not None:
+            # A save changes nothing in the game, replaying it would only overwrite the file
+            self.recorder.record_input([key for key in keys if key != pygame.K_F5], direction)
+        return self.player.move(direction)
 
     def enemy_turn(self, player_moved: bool):
         if player_moved:
-            # Order enemies by distance to player
-            self.tilemap.enemies = sorted(
-                self.tilemap.enemies, key=lambda x: x.simple_distance_to(self.player)
-            )
-            # If player moved and movement finished -> Move minions
-            for enemy in self.tilemap.enemies:
+            # If player moved and movement finished -> Move the minions near the player
+            acting = self.tilemap.scheduler.take_turn(self.player, self.tilemap.occupancy)
+            if self.planner is not None and self.tilemap.use_flow_field:
+                # Committed by update() once it is done, the player's step animates meanwhile
+                self.planner.plan(self.tilemap, self.player, acting)
+                return True
+            if self.tilemap.use_flow_field:
+                self.tilemap.update_flow_field(self.player)
+            for enemy in acting:
                 enemy.move()
             return True
         return False
 
-    def run(self):
-        while self.running:
-            self.dt = self.clock.tick(60) / 1000
-
-            if self.waiting_to_finish_movement:
-                finished = all(
-                    [en.round_state == AIRoundState.DONE for en in self.tilemap.enemies]
-                )
-                if finished:
-                    self.waiting_to_finish_movement = False
+    def update(self):
+        """Advance the turn logic and the world by one simulation tick of self.dt seconds."""
+        if self.recorder is not None:
+            self.recorder.begin_frame(self.dt)
+        if self.replay is not None:
+            self.dt = self.replay.begin_frame()
+
+        if self.waiting_to_finish_movement:
+            if self.replay is not None:
+                # Commit in the same frames as the recorded session did
+                planned = self.replay.committed() and (self.planner is None or self.planner.commit(block=True))
             else:
+                # Headless runs wait for the plan, so they stay frame-exact from run to run
+                planned = self.planner is None or self.planner.commit(block=self.headless)
+            if self.recorder is not None:
+                self.recorder.record_commit(planned)
+            if planned and self.tilemap.scheduler.all_done():
+                self.waiting_to_finish_movement = False
+        else:
+            # Everything is at rest between turns, so the snapshot needs no movement state
+            with self.profiler.phase("autosave"):
+                if (self.autosaver is not None and not self.player.moving and self.turn % self.autosave_interval == 0
+                        and self.turn != self.autosaver.saved_turn):
+                    self.autosaver.save(self)
+            # Handle player input
+            with self.profiler.phase("input"):
                 player_moved = self.handle_input()
+            # Move creeps
+            with self.profiler.phase("enemy_turn"):
                 enemies_moved = self.enemy_turn(player_moved)
 
-                if player_moved and enemies_moved:
-                    self.waiting_to_finish_movement = True
+            if player_moved:
+                self.turn += 1
+            if player_moved and enemies_moved:
+                self.waiting_to_finish_movement = True
 
-            # Handle player input
-            # Move creeps
+        self.update_world()
+
+    def end_frame(self):
+        if self.replay is not None:
+            self.replay.end_frame(self.turn)
+            if self.replay.finished:
+                self.running = False
+
+    def run(self, max_fps: int = 60):
+        """Simulate in fixed ticks and render at most max_fps frames per second.
+
+        Real time is collected in an accumulator and spent in whole ticks, so a slow
+        frame is followed by several ticks and one render instead of slowing the game down.
+        The time left in the accumulator places the walking entities between two ticks,
+        so rendering faster than the simulation still shows smooth movement.
+        """
+        # Generate the next floor while this one is played
+        self.prefetch_next_floor()
+        accumulator = 0.0
+        while self.running:
+            accumulator += self.clock.tick(max_fps) / 1000
+            ticks = min(int(accumulator / TICK), MAX_TICKS_PER_FRAME)
+            accumulator = min(accumulator - ticks * TICK, TICK)
+
+            self.profiler.begin_frame()
+            for _ in range(ticks):
+                self.dt = TICK
+                self.update()
+                self.end_frame()
+                if not self.running:
+                    break
             # Render screen
-            self.render_screen()
+            if self.replay is not None:
+                self.replay.begin_render()
+            self.render_screen(accumulator)
+            if self.replay is not None:
+                self.replay.end_render()
+            self.profiler.end_frame()
+
+        self.prefetcher.shutdown()
+        if self.planner is not None:
+            self.planner.shutdown()
+        if self.autosaver is not None:
+            self.autosaver.shutdown()
+        pygame.quit()
+
+    def run_headless(self, turns: int, dt: float = TICK, max_frames: int = None):
+        """Run the game logic for the given number of turns as fast as possible, without rendering."""
+        max_frames = max_frames or turns * 1000
+        frames = 0
+        # A loaded game plays the given number of turns on top of the saved ones
+        first_turn = self.turn
+        start = time.perf_counter()
+        while self.running and self.turn - first_turn < turns and frames < max_frames:
+            self.dt = dt
+            self.profiler.begin_frame()
+            self.update()
+            self.profiler.end_frame()
+            self.end_frame()
+            frames += 1
+        elapsed = time.perf_counter() - start
+
+        if self.planner is not None:
+            self.planner.shutdown()
+        if self.autosaver is not None:
+            self.autosaver.shutdown()
+        played = self.turn - first_turn
+        print(f"{played} turns, {frames} frames in {elapsed:.3f}s: "
+              f"{played / elapsed:.1f} turns/s, {frames / elapsed:.1f} frames/s")
+        pygame.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PyGame Roguelike")
+    parser.add_argument("--headless", action="store_true", help="run the game logic without a display")
+    parser.add_argument("--turns", type=int, default=1000, help="number of turns to play when headless")
+    parser.add_argument("--actor-store", action="store_true",
+                        help="move and animate enemies in bulk from NumPy arrays")
+    parser.add_argument("--map-size", type=int, nargs=2, default=(40, 20), metavar=("WIDTH", "HEIGHT"),
+                        help="map size in tiles")
+    parser.add_argument("--rooms", type=int, default=50, help="number of room placement attempts")
+    parser.add_argument("--seed", type=int, default=None, help="seed for dungeon generation and scripted input")
+    parser.add_argument("--streamed", action="store_true",
+                        help="play on an endless map generated in chunks around the player")
+    parser.add_argument("--autosave", type=int, default=None, metavar="TURNS",
+                        help="save to autosave.npz in the background every TURNS turns, 0 disables it "
+                             "(default: 10, off with --headless)")
+    parser.add_argument("--load", default=None, metavar="PATH", help="continue from a saved game")
+    parser.add_argument("--full-redraw", action="store_true",
+                        help="redraw and flip the whole screen every frame instead of only the changed areas")
+    parser.add_argument("--room-graph", action="store_true",
+                        help="path enemies over the room graph instead of a flow field around the player, "
+                             "for large maps")
+    parser.add_argument("--sync-ai", action="store_true",
+                        help="plan enemy turns on the main thread instead of a worker thread")
+    parser.add_argument("--first-frame", action="store_true",
+                        help="render a single frame, print the cold start time and quit")
+    parser.add_argument("--fps", type=int, default=60,
+                        help="render at most this many frames per second, above or below the "
+                             f"{SIMULATION_RATE} ticks per second the game itself always runs at")
+    parser.add_argument("--record", default=None, metavar="PATH", help="record the session's input to PATH")
+    parser.add_argument("--replay", default=None, metavar="PATH",
+                        help="play a recorded session back in real time, as fast as possible with --headless")
+    parser.add_argument("--replay-report", default=None, metavar="PATH",
+                        help="write the replay's timings as JSON, comparable with rogue.benchmark compare")
+    args = parser.parse_args()
+    if args.fps < 1:
+        parser.error("--fps must be at least 1, an unlimited frame rate would keep a CPU core busy")
+    if args.autosave is None:
+        # Headless runs are for profiling and CI, they shouldn't write files or time the save I/O
+        args.autosave = 0 if args.headless else 10
+    if args.load and args.streamed:
+        parser.error("saved games are fixed size floors, they can't be loaded with --streamed")
+    if args.room_graph and args.streamed:
+        parser.error("the room graph is built per floor, a streamed floor paths with the flow field")
+    if args.load and args.record:
+        parser.error("a loaded game can't be recorded, its replay would start from a fresh floor")
+
+    # Only a fixed seed can be generated again, so only those are worth caching
+    level_cache = LevelCache() if args.seed is not None else None
 
+    if args.replay:
+        log = InputLog.load(args.replay)
+        settings = dict(log.settings, map_size=tuple(log.settings["map_size"]))
+        game = Game(headless=args.headless, level_cache=level_cache, dirty_rendering=not args.full_redraw,
+                    **settings)
+        game.replay = Replay(log)
+        if args.headless:
+            game.run_headless(log.frames, max_frames=log.frames)
+        else:
+            game.run(args.fps)
+        game.replay.report(game, args.replay_report)
+        return
+    if args.first_frame:
+        game = Game(headless=args.headless, use_actor_store=args.actor_store, seed=args.seed,
+                    level_cache=level_cache, map_size=tuple(args.map_size), max_rooms=args.rooms,
+                    streamed=args.streamed, room_graph_pathing=args.room_graph)
+        game.update()
+        game.render_screen()
+        print(f"First frame after {game.first_frame_time * 1000:.1f} ms")
         pygame.quit()
+    elif args.headless:
+        game = Game(headless=True, input_source=RandomWalkInput(args.seed), use_actor_store=args.actor_store,
+                    seed=args.seed, level_cache=level_cache, map_size=tuple(args.map_size), max_rooms=args.rooms,
+                    streamed=args.streamed, autosave_interval=args.autosave, threaded_ai=not args.sync_ai,
+                    room_graph_pathing=args.room_graph)
+        if args.load:
+            game.load_game(args.load)
+        if args.record:
+            game.recorder = InputRecorder(game.settings())
+        game.run_headless(args.turns)
+    else:
+        game = Game(use_actor_store=args.actor_store, seed=args.seed, level_cache=level_cache,
+                    map_size=tuple(args.map_size), max_rooms=args.rooms, streamed=args.streamed,
+                    autosave_interval=args.autosave, dirty_rendering=not args.full_redraw,
+                    threaded_ai=not args.sync_ai, room_graph_pathing=args.room_graph)
+        if args.load:
+            game.load_game(args.load)
+        if args.record:
+            game.recorder = InputRecorder(game.settings())
+        game.run(args.fps)
+    if args.record:
+        game.recorder.log(game).save(args.record)
+        print(f"Input recorded to {args.record}")
 
 
 if __name__ == "__main__":
-    game = Game()
-    game.run()
+    main()
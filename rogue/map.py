@@ -1,165 +1,343 @@
 import random
+from collections import OrderedDict
 from os.path import join
-from typing import Iterator
+from typing import Optional
 
 import numpy as np
 import pygame
 import tcod
 from tcod.map import compute_fov
 
+from rogue.actor_store import ActorStore
+from rogue.assets import load_image
+from rogue.atlas import TILE_COUNT, cut_tile, get_atlas, tile_name
+from rogue.autotile import compute_autotile_indices
 from rogue.enemy import Enemy
-from rogue.enums import IntTiles, Tiles, TileState
+from rogue.enums import IntTiles, TileState
+from rogue.generation import LevelData, generate_dungeon, generate_level, generate_spawn_points
+from rogue.level_cache import LevelCache
+from rogue.occupancy import OccupancyGrid
 from rogue.player import Player
 from rogue.rect_room import RectangularRoom
-from rogue.tile import Tile
+from rogue.room_graph import RoomGraph
+from rogue.scheduler import TurnScheduler
+from rogue.tile_layer import TileLayer, TileStateImages
 
 
-class TilesGroup(pygame.sprite.Group):
-    def draw(self, surface: pygame.surface.Surface):
-        super().draw(surface=surface)
+_tile_state_images: Optional[TileStateImages] = None
+
+
+def get_tile_state_images() -> TileStateImages:
+    """Return the process-wide tile images in every state, built on first use."""
+    global _tile_state_images
+    if _tile_state_images is None:
+        atlas = get_atlas()
+        if atlas is not None:
+            tile_images = {i: atlas.get(tile_name(i)) for i in range(TILE_COUNT)}
+        else:
+            tileset = load_image(join("resources", "tiles", "ff.png"))
+            tile_images = {i: cut_tile(tileset, i) for i in range(TILE_COUNT)}
+        _tile_state_images = TileStateImages(tile_images)
+    return _tile_state_images
+
+
+def compute_flow_field(cost: np.ndarray, root: tuple[int, int]) -> np.ndarray:
+    """Return the walking distance from every tile of the cost map to root."""
+    flow_field = tcod.path.maxarray(cost.shape, dtype=np.int32, order="F")
+    flow_field[root] = 0
+    tcod.path.dijkstra2d(flow_field, cost, cardinal=2, diagonal=0, out=flow_field)
+    return flow_field
+
+
+def descend_flow_field(flow_field: np.ndarray, origin: tuple[int, int],
+                       position: tuple[int, int]) -> Optional[tuple[int, int]]:
+    """Return the neighbour of position that is closest to the root, None if there is none.
+
+    The flow field covers the map from origin on, positions are in map coordinates.
+    """
+    width, height = flow_field.shape
+    fx, fy = position[0] - origin[0], position[1] - origin[1]
+    if not (0 <= fx < width and 0 <= fy < height):
+        return None
+    best_step = None
+    best_distance = flow_field[fx, fy]
+    for dx, dy in ((0, -1), (1, 0), (0, 1), (-1, 0)):
+        x, y = fx + dx, fy + dy
+        if 0 <= x < width and 0 <= y < height and flow_field[x, y] < best_distance:
+            best_step = (x + origin[0], y + origin[1])
+            best_distance = flow_field[x, y]
+    return best_step
+
+
+def window_union(a: tuple[slice, slice], b: tuple[slice, slice]) -> tuple[slice, slice]:
+    """Return the smallest window covering both windows."""
+    return (slice(min(a[0].start, b[0].start), max(a[0].stop, b[0].stop)),
+            slice(min(a[1].start, b[1].start), max(a[1].stop, b[1].stop)))
+
+
+def window_contains(window: tuple[slice, slice], x: int, y: int) -> bool:
+    return window[0].start <= x < window[0].stop and window[1].start <= y < window[1].stop
 
 
 class TileMap:
-    def __init__(self, size: tuple[int], enemy_group: pygame.sprite.Group):
+    def __init__(self, size: tuple[int], enemy_group: pygame.sprite.Group, use_actor_store: bool = False,
+                 seed: Optional[int] = None, level_cache: Optional[LevelCache] = None,
+                 level: Optional[LevelData] = None, max_rooms: int = 50, room_min_size: int = 3,
+                 room_max_size: int = 6, room_graph_pathing: bool = False):
         self.player_ref = None
         self.enemy_group = enemy_group
+        # Enemies spawned while this is set are moved and animated in bulk by the store
+        self.actor_store: Optional[ActorStore] = ActorStore() if use_actor_store else None
 
         self.size = size
-        self.player_position = (0, 0)
-        self.tileset = pygame.image.load(
-            join("resources", "tiles", "ff.png")).convert_alpha()
-
-        self.tile_images = {
-            i: self.create_tile_image(i) for i in range(256+1)
+        # The seed alone decides the layout and the spawns
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        # Raise max_rooms together with size for large maps, generation scales with the room count
+        self.generation_params = {
+            "max_rooms": max_rooms,
+            "room_min_size": room_min_size,
+            "room_max_size": room_max_size,
         }
+        self.player_position = (0, 0)
+        self.spawn_points: list[tuple[int, int]] = []
+        # Shared by every map, a cell only stores its autotile index
+        self.state_images = get_tile_state_images()
+        self.tile_images = self.state_images.tile_images
 
-        self.all_tiles = np.full(size, fill_value=IntTiles.WALL, order="F")
-        self.final_tiles = np.full(size, fill_value=Tiles.FLOOR, order="F")
+        self.all_tiles = np.full(size, fill_value=IntTiles.WALL, dtype=np.int8, order="F")
+        self.tile_indices = np.zeros(size, dtype=np.uint16, order="F")
         self.visible_tiles = np.full(size, fill_value=False, order="F")
         self.explored_tiles = np.full(size, fill_value=False, order="F")
         self.rooms: list[RectangularRoom] = []
         self.enemies: list[Enemy] = []
-        self.tiles_group = TilesGroup()
+        self.tile_layer: TileLayer = None
         self.tilemap_states = np.full(
-            size, fill_value=TileState.UNEXPLORED, order="F")
+            size, fill_value=TileState.UNEXPLORED, dtype=np.int8, order="F")
 
         self.entities = []
+        self.occupancy = OccupancyGrid(size)
+
+        # Picks the enemies that act each turn, only those near the player
+        self.scheduler = TurnScheduler()
+
+        # Enemies step down a distance field rooted at the player instead of pathing one by one,
+        # unless they path over the room graph, which scales to maps too large for a flow field window
+        self.use_flow_field = not room_graph_pathing
+        self.flow_field: Optional[np.ndarray] = None
+        # Map area the flow field covers, it only has to reach past the scheduler's activation range
+        self.flow_window: tuple[slice, slice] = (slice(0, size[0]), slice(0, size[1]))
+        # Without the flow field, enemies path over the rooms first and only refine the next stretch on the grid
+        self.use_room_graph = True
+        self.room_graph: Optional[RoomGraph] = None
+
+        # FOV is only recomputed when the origin or the terrain changes
+        self.fov_radius = 4
+        self.fov_cache: OrderedDict[tuple[tuple[int, int], int], tuple[tuple[slice, slice], np.ndarray]] = OrderedDict()
+        self.fov_cache_size = 1024
+        self.fov_origin = None
+        self.fov_window: Optional[tuple[slice, slice]] = None
+        self.fov_changed: Optional[tuple[slice, slice]] = None
+        # Bumped on every terrain change, invalidates FOV results
+        self.terrain_version = 0
+        self.fov_terrain_version = 0
 
-        self.generate_dungeon()
-        self.decide_tile_types()
+        if level is None and level_cache is not None:
+            level = level_cache.load(size, self.seed, **self.generation_params)
+        if level is None:
+            level = generate_level(size, self.seed, **self.generation_params)
+            if level_cache is not None:
+                level_cache.save(level, **self.generation_params)
+        self.load_level(level)
+
+    def load_level(self, level: LevelData):
+        """Use an already generated level and build its tile surfaces."""
+        self.all_tiles = level.all_tiles
+        self.tile_indices = level.tile_indices
+        self.rooms = level.rooms
+        self.player_position = level.player_position
+        self.spawn_points = level.spawn_points
+        self.terrain_version += 1
+        # Built with the level instead of on first use, so no enemy turn has to wait for it
+        self.room_graph = level.room_graph
+        if self.room_graph is None and not self.use_flow_field and self.use_room_graph:
+            self.room_graph = RoomGraph(self.all_tiles, self.rooms)
         self.create_tiles()
 
     def init_with_player(self, player_ref):
         self.player_ref = player_ref
+        self.occupancy.add(player_ref)
         self.generate_enemies(self.enemy_group)
 
         self.entities.append(player_ref)
 
-    def update_fov(self, player: Player) -> None:
-        """Recompute the visible area based on the players point of view."""
-        self.visible_tiles[:] = compute_fov(
-            self.all_tiles,
-            (player.rect.x//16, player.rect.y//16),
-            radius=4,
-        )
+    def update_fov(self, player: Player) -> Optional[tuple[slice, slice]]:
+        """Recompute the visible area based on the players point of view.
+
+        Only runs when the player's tile or the terrain changed. Returns the region
+        whose tile states may have changed, or None if nothing changed.
+        """
+        origin = (player.rect.x//16, player.rect.y//16)
+        if origin == self.fov_origin and self.fov_terrain_version == self.terrain_version:
+            return None
+
+        window, mask = self.get_fov_mask(origin)
+        previous = self.fov_window
+        if previous is not None:
+            self.visible_tiles[previous] = False
+        self.visible_tiles[window] = mask
         # If a tile is "visible" it should be added to "explored".
-        self.explored_tiles |= self.visible_tiles
+        self.explored_tiles[window] |= mask
 
-        self.tilemap_states[:] = (self.explored_tiles.astype(
-            int) + self.visible_tiles.astype(int))
+        changed = window if previous is None else window_union(window, previous)
+        self.tilemap_states[changed] = self.explored_tiles[changed].astype(int) + self.visible_tiles[changed]
 
-    def create_tile_image(self, idx: int) -> pygame.Surface:
-        tmp_surface = pygame.Surface((16, 16))
-        x = idx % 24
-        y = idx // 24
-        tmp_surface.blit(self.tileset, (0, 0), (x * 16, y * 16, 16, 16))
-        return tmp_surface
+        self.fov_origin = origin
+        self.fov_window = window
+        # Several ticks can run before a frame is rendered, it takes and clears what changed in all of them
+        self.fov_changed = changed if self.fov_changed is None else window_union(self.fov_changed, changed)
+        return changed
 
-    def decide_tile_types(self):
-        for x in range(self.size[0]):
-            for y in range(self.size[1]):
-                # We only care about walls right now
-                if self.all_tiles[x][y] == IntTiles.WALL:
-                    neighbor_weights = ""
-                    for j in [-1, 0, 1]:
-                        for i in [-1, 0, 1]:
-                            if i == 0 and j == 0:
-                                continue
-                            xx = x+i
-                            yy = y+j
-                            if 0 <= xx < self.size[0] and 0 <= yy < self.size[1]:
-                                neighbor_weights += {
-                                    "0": "1",
-                                    "1": "0"
-                                }[str(self.all_tiles[xx][yy])]
-                            else:
-                                neighbor_weights += "1"
-                    self.final_tiles[x][y] = self.tile_images[int(
-                        neighbor_weights[::-1], 2)]
-                else:
-                    self.final_tiles[x][y] = self.tile_images[256]
+    def get_fov_mask(self, origin: tuple[int, int]) -> tuple[tuple[slice, slice], np.ndarray]:
+        """Return the FOV mask of an origin and the map window it covers, memoized per origin and radius."""
+        if self.fov_terrain_version != self.terrain_version:
+            self.fov_cache.clear()
+            self.fov_terrain_version = self.terrain_version
 
-    def create_tiles(self):
-        for x in range(self.size[0]):
-            for y in range(self.size[1]):
-                Tile(self.tiles_group, self.final_tiles[x][y],
-                     pygame.rect.Rect(x*16, y*16, 16, 16)
-                     )
-
-    def tunnel_between(
-        self, start: tuple[int, int], end: tuple[int, int]
-    ) -> Iterator[tuple[int, int]]:
-        """Return an L-shaped tunnel between these two points."""
-        x1, y1 = start
-        x2, y2 = end
-        if random.random() < 0.5:  # 50% chance.
-            # Move horizontally, then vertically.
-            corner_x, corner_y = x2, y1
-        else:
-            # Move vertically, then horizontally.
-            corner_x, corner_y = x1, y2
+        key = (origin, self.fov_radius)
+        cached = self.fov_cache.get(key)
+        if cached is not None:
+            self.fov_cache.move_to_end(key)
+            return cached
 
-        # Generate the coordinates for this tunnel.
-        for x, y in tcod.los.bresenham((x1, y1), (corner_x, corner_y)).tolist():
-            yield x, y
-        for x, y in tcod.los.bresenham((corner_x, corner_y), (x2, y2)).tolist():
-            yield x, y
+        # Nothing beyond the radius can be lit, so FOV only needs the window around the origin
+        radius = self.fov_radius
+        x1, x2 = max(0, origin[0] - radius), min(self.size[0], origin[0] + radius + 1)
+        y1, y2 = max(0, origin[1] - radius), min(self.size[1], origin[1] + radius + 1)
+        window = (slice(x1, x2), slice(y1, y2))
+        mask = compute_fov(self.all_tiles[window], (origin[0] - x1, origin[1] - y1), radius=radius)
 
-    def generate_enemies(self, enemy_group: pygame.sprite.Group):
-        for c_room in self.rooms:
-            x = random.randint(c_room.x1, c_room.x2 - 1)
-            y = random.randint(c_room.y1, c_room.y2 - 1)
+        self.fov_cache[key] = (window, mask)
+        if len(self.fov_cache) > self.fov_cache_size:
+            self.fov_cache.popitem(last=False)
+        return window, mask
 
-            if any(enemy.rect.x // 16 == x and enemy.rect.y // 16 == y for enemy in self.enemies):
-                continue
+    def get_cost_map(self, window: Optional[tuple[slice, slice]] = None) -> np.ndarray:
+        """Return the movement cost of every tile, or of a window, with blocking entities made expensive."""
+        if window is None:
+            window = (slice(0, self.size[0]), slice(0, self.size[1]))
+        cost = np.array(self.all_tiles[window], dtype=np.int8)
 
-            c_enemy = Enemy(enemy_group, (x, y), self, self.player_ref)
-            self.enemies.append(c_enemy)
-            self.entities.append(c_enemy)
+        # Add to the cost of a position blocked by an entity, unless it is a wall.
+        # A lower number means more enemies will crowd behind each other in
+        # hallways.  A higher number means enemies will take longer paths in
+        # order to surround the player.
+        cost[(self.occupancy.ids[window] >= 0) & (cost > 0)] += 10
+        return cost
 
-    def generate_dungeon(self):
-        room_min_size = 3
-        room_max_size = 6
-        max_rooms = 50
-        for _ in range(max_rooms):
-            room_width = random.randint(room_min_size, room_max_size)
-            room_height = random.randint(room_min_size, room_max_size)
-
-            x = random.randint(1, self.size[0] - room_width - 1)
-            y = random.randint(1, self.size[1] - room_height - 1)
-
-            new_room = RectangularRoom(x, y, room_width, room_height)
-            if any(new_room.intersects(other_room) for other_room in self.rooms):
+    def get_flow_window(self, position: tuple[int, int]) -> tuple[slice, slice]:
+        """Return the area a flow field rooted at position covers.
+
+        That is everything within twice the activation range, paths leaving it are
+        too long to matter to an active enemy anyway.
+        """
+        reach_x, reach_y = (2 * reach for reach in self.scheduler.activation_range)
+        x, y = position
+        return (slice(max(0, x - reach_x), min(self.size[0], x + reach_x + 1)),
+                slice(max(0, y - reach_y), min(self.size[1], y + reach_y + 1)))
+
+    def update_flow_field(self, target) -> np.ndarray:
+        """Run one Dijkstra pass rooted at the target, shared by every enemy this turn."""
+        self.flow_window = self.get_flow_window(target.tile_position)
+        origin = (self.flow_window[0].start, self.flow_window[1].start)
+        root = (target.tile_position[0] - origin[0], target.tile_position[1] - origin[1])
+        self.flow_field = compute_flow_field(self.get_cost_map(self.flow_window), root)
+        return self.flow_field
+
+    def flow_step(self, position: tuple[int, int]) -> Optional[tuple[int, int]]:
+        """Return the neighbour of position that is closest to the flow field target, None if there is none."""
+        if self.flow_field is None:
+            self.update_flow_field(self.player_ref)
+        return descend_flow_field(self.flow_field, (self.flow_window[0].start, self.flow_window[1].start), position)
+
+    def find_path(self, start: tuple[int, int], target: tuple[int, int]) -> list[tuple[int, int]]:
+        """Return the path from start towards target up to the next waypoint of the room graph.
+
+        The graph is built on first use if the level came without one.
+        """
+        if self.room_graph is None:
+            self.room_graph = RoomGraph(self.all_tiles, self.rooms)
+        return self.room_graph.path_to(start, target, self.get_cost_map)
+
+    def set_tile(self, x: int, y: int, kind: IntTiles) -> bool:
+        """Change the terrain of one tile, e.g. to dig through a wall or close a door.
+
+        Only the 3x3 autotile neighbourhood, the chunks showing it, the FOV results that
+        can see the tile and the path caches covering it are updated. Returns False if
+        the tile already was of that kind.
+        """
+        if self.all_tiles[x, y] == kind:
+            return False
+        if kind == IntTiles.WALL and self.occupancy.at(x, y) is not None:
+            raise ValueError(f"can't build a wall on ({x}, {y}), an entity stands there")
+        self.all_tiles[x, y] = kind
+
+        # A wall's image depends on its 8 neighbours, so theirs can change too
+        window = (slice(max(0, x - 1), min(self.size[0], x + 2)), slice(max(0, y - 1), min(self.size[1], y + 2)))
+        self.tile_indices[window] = compute_autotile_indices(self.all_tiles, window)
+        self.tile_layer.invalidate(window)
+
+        # Keep the FOV results that can't see the tile, unless the whole cache is stale anyway
+        fov_in_sync = self.fov_terrain_version == self.terrain_version
+        self.terrain_version += 1
+        if fov_in_sync:
+            self.fov_terrain_version = self.terrain_version
+            for key in [key for key, (fov_window, _) in self.fov_cache.items() if window_contains(fov_window, x, y)]:
+                del self.fov_cache[key]
+            if self.fov_window is not None and window_contains(self.fov_window, x, y):
+                self.fov_origin = None
+
+        if self.flow_field is not None and window_contains(self.flow_window, x, y):
+            self.flow_field = None
+        if self.room_graph is not None:
+            self.room_graph.invalidate((slice(x, x + 1), slice(y, y + 1)))
+        return True
+
+    def decide_tile_types(self):
+        self.tile_indices = compute_autotile_indices(self.all_tiles)
+
+    def create_tiles(self):
+        self.tile_layer = TileLayer(self.state_images, self.tile_indices)
+
+    def memory_stats(self) -> dict[str, int]:
+        """Return the bytes held per part of the map, the shared tile images are counted separately."""
+        return {
+            "tile_indices": self.tile_indices.nbytes,
+            "all_tiles": self.all_tiles.nbytes,
+            "tile_states": self.tilemap_states.nbytes + self.visible_tiles.nbytes + self.explored_tiles.nbytes,
+            "baked_chunks": self.tile_layer.nbytes(),
+            "shared_images": self.state_images.stats()["bytes"],
+        }
+
+    def generate_enemies(self, enemy_group: pygame.sprite.Group):
+        for x, y in self.spawn_points:
+            if self.occupancy.at(x, y) is not None:
                 continue
 
-            new_room.block(self.all_tiles)
+            self.spawn_enemy(enemy_group, (x, y))
 
-            if len(self.rooms) == 0:
-                # The first room, where the player starts.
-                self.player_position = new_room.center
-            else:  # All rooms after the first.
-                # Dig out a tunnel between this room and the previous one.
-                for x, y in self.tunnel_between(self.rooms[-1].center, new_room.center):
-                    self.all_tiles[x, y] = Tiles.FLOOR.value
+    def spawn_enemy(self, enemy_group: pygame.sprite.Group, position: tuple[int, int]) -> Enemy:
+        c_enemy = Enemy(enemy_group, position, self, self.player_ref)
+        self.enemies.append(c_enemy)
+        self.entities.append(c_enemy)
+        self.occupancy.add(c_enemy)
+        c_enemy.scheduler = self.scheduler
+        if self.actor_store is not None:
+            self.actor_store.add(c_enemy)
+        return c_enemy
 
-            self.rooms.append(new_room)
+    def generate_dungeon(self):
+        self.rooms, self.player_position = generate_dungeon(self.all_tiles, self.rng, **self.generation_params)
+        self.spawn_points = generate_spawn_points(self.rooms, self.rng, self.player_position)
+        self.terrain_version += 1
+        self.room_graph = None
@@ -0,0 +1,73 @@
+from typing import Optional
+
+import numpy as np
+
+from rogue.entity import Entity
+
+
+class OccupancyGrid:
+    """Tracks the blocking entity standing on each tile.
+
+    Entities register once and the grid follows their tile_position from then on.
+    """
+
+    def __init__(self, size: tuple[int, int]):
+        self.size = size
+        self.ids = np.full(size, fill_value=-1, dtype=np.int32, order="F")
+        self.entities: dict[int, Entity] = {}
+        # Ids hidden under the one in the grid, for the rare tile shared by several entities
+        self.stacked: dict[tuple[int, int], list[int]] = {}
+        self.next_id = 0
+
+    def add(self, entity: Entity) -> int:
+        entity_id = self.next_id
+        self.next_id += 1
+        self.entities[entity_id] = entity
+        entity.occupancy_id = entity_id
+        entity.occupancy = self
+        self.occupy(entity_id, entity.tile_position)
+        return entity_id
+
+    def remove(self, entity: Entity):
+        self.vacate(entity.occupancy_id, entity.tile_position)
+        del self.entities[entity.occupancy_id]
+        entity.occupancy = None
+
+    def move(self, entity: Entity, old: tuple[int, int], new: tuple[int, int]):
+        self.vacate(entity.occupancy_id, old)
+        self.occupy(entity.occupancy_id, new)
+
+    def occupy(self, entity_id: int, position: tuple[int, int]):
+        x, y = position
+        if self.ids[x, y] >= 0:
+            self.stacked.setdefault((x, y), []).append(int(self.ids[x, y]))
+        self.ids[x, y] = entity_id
+
+    def vacate(self, entity_id: int, position: tuple[int, int]):
+        x, y = position
+        stacked = self.stacked.get((x, y))
+        if self.ids[x, y] == entity_id:
+            self.ids[x, y] = stacked.pop() if stacked else -1
+        elif stacked and entity_id in stacked:
+            stacked.remove(entity_id)
+        if stacked is not None and not stacked:
+            del self.stacked[(x, y)]
+
+    def at(self, x: int, y: int) -> Optional[Entity]:
+        entity_id = self.ids[x, y]
+        if entity_id < 0:
+            return None
+        return self.entities[int(entity_id)]
+
+    def in_range(self, position: tuple[int, int], reach: tuple[int, int]) -> list[Entity]:
+        """Return the entities at most reach[0] columns and reach[1] rows away from position."""
+        x, y = position
+        x1, x2 = max(0, x - reach[0]), min(self.size[0], x + reach[0] + 1)
+        y1, y2 = max(0, y - reach[1]), min(self.size[1], y + reach[1] + 1)
+        window = self.ids[x1:x2, y1:y2]
+        entities = [self.entities[int(entity_id)] for entity_id in window[window >= 0]]
+        # The grid only holds one id per tile, the ones under it are listed apart
+        for (sx, sy), stacked in self.stacked.items():
+            if x1 <= sx < x2 and y1 <= sy < y2:
+                entities += [self.entities[entity_id] for entity_id in stacked]
+        return entities
@@ -0,0 +1,163 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from rogue.enums import AIRoundState, AIState, TileState
+from rogue.map import compute_flow_field, descend_flow_field
+
+# Intent of an enemy next to the player, any other intent is the tile to step on
+ATTACK = None
+
+
+def plan_intents(cost: np.ndarray, origin: tuple[int, int], player_position: tuple[int, int],
+                 occupied: np.ndarray, positions: list[tuple[int, int]], chasing: list[bool], visible: list[bool],
+                 busy: list[bool], order: list[int]) -> tuple[np.ndarray, list[int], list[tuple[int, object]]]:
+    """Decide what every acting enemy does this turn, with the same rules as Enemy.update_state.
+
+    Works on plain copies only, so it can run on another thread. occupied counts the
+    entities on each tile of the window at origin and is updated as enemies step.
+    Returns the flow field, the enemies that started chasing and (enemy, intent)
+    pairs in the order they act.
+    """
+    root = (player_position[0] - origin[0], player_position[1] - origin[1])
+    flow_field = compute_flow_field(cost, root)
+
+    started_chasing = []
+    intents = []
+    for i in order:
+        if not chasing[i]:
+            if not visible[i]:
+                continue
+            chasing[i] = True
+            started_chasing.append(i)
+        if busy[i]:
+            continue
+        position = positions[i]
+        next_step = descend_flow_field(flow_field, origin, position)
+        if next_step is None:
+            continue
+        if abs(player_position[0] - position[0]) + abs(player_position[1] - position[1]) == 1:
+            intents.append((i, ATTACK))
+            continue
+        x, y = next_step[0] - origin[0], next_step[1] - origin[1]
+        if occupied[x, y]:
+            continue
+        occupied[position[0] - origin[0], position[1] - origin[1]] -= 1
+        occupied[x, y] += 1
+        positions[i] = next_step
+        busy[i] = True
+        intents.append((i, next_step))
+    return flow_field, started_chasing, intents
+
+
+class AIPlanner:
+    """Plans the enemy turn on a worker thread while the player's step animates.
+
+    plan() copies what planning needs, the cost map, occupancy and the acting
+    enemies, at the start of a turn. commit() applies the finished plan to the
+    enemies in one go on the main thread. The pathfinding itself releases the GIL.
+    """
+
+    def __init__(self):
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.pending: Optional[Future] = None
+        self.actors = []
+        self.acting = []
+        self.tilemap = None
+        self.terrain_version = 0
+        self.flow_window: Optional[tuple[slice, slice]] = None
+
+    def plan(self, tilemap, player, acting: list):
+        """Start planning the turn of the acting enemies, listed in the order they act."""
+        index = {}
+        for actor in acting:
+            index.setdefault(actor, len(index))
+        actors = list(index)
+        window = tilemap.get_flow_window(player.tile_position)
+        origin = (window[0].start, window[1].start)
+
+        occupancy = tilemap.occupancy
+        occupied = (occupancy.ids[window] >= 0).astype(np.int16)
+        for (x, y), stacked in occupancy.stacked.items():
+            if window[0].start <= x < window[0].stop and window[1].start <= y < window[1].stop:
+                occupied[x - origin[0], y - origin[1]] += len(stacked)
+
+        states = tilemap.tilemap_states
+        args = (
+            tilemap.get_cost_map(window),
+            origin,
+            player.tile_position,
+            occupied,
+            [actor.tile_position for actor in actors],
+            [actor.ai_state == AIState.CHASING for actor in actors],
+            [states[actor.tile_position[0], actor.tile_position[1]] == TileState.VISIBLE for actor in actors],
+            [actor.round_state == AIRoundState.MOVING or actor.target_position is not None for actor in actors],
+            [index[actor] for actor in acting],
+        )
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai_planner")
+        self.pending = self.executor.submit(plan_intents, *args)
+        self.actors = actors
+        self.acting = acting
+        self.tilemap = tilemap
+        self.terrain_version = tilemap.terrain_version
+        self.flow_window = window
+
+    def commit(self, block: bool = False) -> bool:
+        """Apply the plan once it is finished, return True when there is nothing left pending.
+
+        A plan made for terrain that changed since, e.g. a streamed map that moved
+        its window, is thrown away and the turn is planned again right here.
+        """
+        if self.pending is None:
+            return True
+        if not block and not self.pending.done():
+            return False
+        flow_field, started_chasing, intents = self.pending.result()
+        self.pending = None
+        tilemap = self.tilemap
+        actors = self.actors
+        acting = self.acting
+        self.actors = []
+        self.acting = []
+        self.tilemap = None
+
+        if tilemap.terrain_version != self.terrain_version:
+            tilemap.update_flow_field(tilemap.player_ref)
+            remaining = set(tilemap.enemies)
+            for actor in acting:
+                if actor in remaining:
+                    actor.move()
+            return True
+
+        tilemap.flow_field = flow_field
+        tilemap.flow_window = self.flow_window
+        for i in started_chasing:
+            actors[i].ai_state = AIState.CHASING
+        for i, intent in intents:
+            actor = actors[i]
+            if intent is ATTACK:
+                print("Minion attacked you!")
+                continue
+            actor.target_position = (intent[0] * 16, intent[1] * 16)
+            actor.tile_position = intent
+            tilemap.scheduler.started_moving()
+            if actor.actor_store is not None:
+                actor.actor_store.set_target(actor.store_index, actor.target_position)
+        return True
+
+    def discard(self):
+        """Drop a pending plan whose floor is being left."""
+        if self.pending is not None:
+            self.pending.result()
+        self.pending = None
+        self.actors = []
+        self.acting = []
+        self.tilemap = None
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        self.pending = None
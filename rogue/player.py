@@ -5,7 +5,7 @@ from typing import Optional
 import pygame
 
 from rogue.components.animator import Animator
-from rogue.entity import Entity
+from rogue.entity import WALK_SPEED, Entity, walk_towards
 from rogue.enums import AnimState, Direction
 
 
@@ -21,7 +21,8 @@ class Player(Entity):
         self.map_ref = tilemap
 
         self.direction = pygame.Vector2()
-        self.speed = 40
+        # Pixels per second
+        self.speed = WALK_SPEED
 
         self.moving = False
         self.moving_direction = Direction.NULL
@@ -43,8 +44,9 @@ class Player(Entity):
         if self.moving:
             self.animator.update_state(AnimState.RUN)
             self.direction = self.float_position - pygame.Vector2(self.target_position[0]*16, self.target_position[1]*16)
-            if abs(self.direction.length()) > 1:
-                self.direction = self.direction.normalize() if self.direction else self.direction
+            step = self.speed * dt
+            if abs(self.direction.length()) > step:
+                self.direction = self.direction.normalize() * step if self.direction else self.direction
                 self.float_position -= self.direction
             else:
                 self.float_position = pygame.Vector2(self.target_position[0]*16, self.target_position[1]*16)
@@ -58,11 +60,15 @@ class Player(Entity):
         elif not self.moving and self.moving_direction == Direction.NULL:
             self.animator.queue_next_animation(AnimState.IDLE)
 
-        self.image = self.animator.get_current_image()
         if self.moving_direction in [Direction.LEFT, Direction.RIGHT]:
             self.facing_direction = self.moving_direction
-        if self.facing_direction == Direction.LEFT:
-            self.image = pygame.transform.flip(self.animator.get_current_image(), True, False)
+        self.image = self.animator.get_current_image(self.facing_direction)
+
+    def render_position(self, lead: float) -> pygame.Vector2:
+        if not self.moving:
+            return self.float_position
+        target = pygame.Vector2(self.target_position[0] * 16, self.target_position[1] * 16)
+        return walk_towards(self.float_position, target, self.speed * lead)
 
     def move(self, move_dir: Direction) -> bool:
         # Invalid movement direction
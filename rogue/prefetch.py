@@ -0,0 +1,92 @@
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional
+
+from rogue.generation import LevelData, generate_level
+from rogue.level_cache import LevelCache
+from rogue.room_graph import RoomGraph
+
+
+def prepare_level(size: tuple[int, int], seed: int, level_cache: Optional[LevelCache], room_graph: bool,
+                  **params) -> LevelData:
+    """Load a level from the cache or generate it, and build its RoomGraph if room_graph is set."""
+    level = level_cache.load(size, seed, **params) if level_cache is not None else None
+    if level is None:
+        level = generate_level(size, seed, **params)
+    if room_graph:
+        # Pickled together with the level, so the graph keeps sharing its all_tiles
+        level.room_graph = RoomGraph(level.all_tiles, level.rooms)
+    return level
+
+
+class LevelPrefetcher:
+    """Generates upcoming floors in a worker process while the current one is played.
+
+    Only the pure data part is generated there, TileMap attaches the surfaces. With
+    room_graph set the floor's RoomGraph is built there too, even for a cached level.
+    """
+
+    def __init__(self, level_cache: Optional[LevelCache] = None, max_workers: int = 1, room_graph: bool = False):
+        self.level_cache = level_cache
+        self.max_workers = max_workers
+        self.room_graph = room_graph
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.futures: dict[tuple, Future] = {}
+        self.submitted_at: dict[tuple, float] = {}
+
+    @staticmethod
+    def key(size: tuple[int, int], seed: int, params: dict) -> tuple:
+        return tuple(size), seed, tuple(sorted(params.items()))
+
+    def prefetch(self, size: tuple[int, int], seed: int, **params):
+        """Start preparing a level in the background, unless it is underway or cached with nothing left to build."""
+        key = self.key(size, seed, params)
+        if key in self.futures:
+            return
+        cached = self.level_cache is not None and self.level_cache.contains(size, seed, **params)
+        if cached and not self.room_graph:
+            return
+        if self.executor is None:
+            # Started lazily, so games that never change floor never spawn a process
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self.futures[key] = self.executor.submit(prepare_level, tuple(size), seed, self.level_cache if cached else None,
+                                                 self.room_graph, **params)
+        self.submitted_at[key] = time.perf_counter()
+
+    def progress(self, size: tuple[int, int], seed: int, **params) -> tuple[str, float]:
+        """Return the state of a prefetch (missing, pending, running, done or failed) and seconds since it started."""
+        key = self.key(size, seed, params)
+        future = self.futures.get(key)
+        if future is None:
+            return "missing", 0.0
+        elapsed = time.perf_counter() - self.submitted_at[key]
+        if future.done():
+            return ("failed" if future.exception() is not None else "done"), elapsed
+        return ("running" if future.running() else "pending"), elapsed
+
+    def get(self, size: tuple[int, int], seed: int, timeout: Optional[float] = None, **params) -> LevelData:
+        """Return the level, waiting for its prefetch or generating it here if it was never requested."""
+        key = self.key(size, seed, params)
+        future = self.futures.pop(key, None)
+        self.submitted_at.pop(key, None)
+
+        level = None
+        if future is not None:
+            level = future.result(timeout)
+        elif self.level_cache is not None:
+            level = self.level_cache.load(size, seed, **params)
+            if level is not None:
+                return level
+        if level is None:
+            level = generate_level(tuple(size), seed, **params)
+
+        if self.level_cache is not None and not self.level_cache.contains(size, seed, **params):
+            self.level_cache.save(level, **params)
+        return level
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.futures.clear()
+        self.submitted_at.clear()
@@ -0,0 +1,112 @@
+import cProfile
+import csv
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import numpy as np
+import pygame
+
+
+class FrameProfiler:
+    """Per-phase frame timings kept in a fixed-size ring buffer.
+
+    Can also capture a cProfile of the next N frames.
+    """
+
+    def __init__(self, phases: list[str], capacity: int = 600):
+        self.phases = phases
+        self.phase_index = {name: i for i, name in enumerate(phases)}
+        self.capacity = capacity
+        # Seconds per phase, one row per frame
+        self.buffer = np.zeros((capacity, len(phases)), dtype=np.float64)
+        self.current = np.zeros(len(phases), dtype=np.float64)
+        self.frames = 0
+
+        self.profile: Optional[cProfile.Profile] = None
+        self.profile_frames_left = 0
+        self.profile_path = "frame_profile.prof"
+
+        self.font: Optional[pygame.font.Font] = None
+
+    def begin_frame(self):
+        self.current[:] = 0
+        if self.profile_frames_left and self.profile is None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.current[self.phase_index[name]] += time.perf_counter() - start
+
+    def end_frame(self):
+        self.buffer[self.frames % self.capacity] = self.current
+        self.frames += 1
+
+        if self.profile is not None:
+            self.profile_frames_left -= 1
+            if self.profile_frames_left <= 0:
+                self.profile.disable()
+                self.profile.dump_stats(self.profile_path)
+                print(f"cProfile of the last frames written to {self.profile_path}")
+                self.profile = None
+
+    def capture_profile(self, frames: int, path: str = "frame_profile.prof"):
+        """Run cProfile over the next frames and write the stats to path."""
+        if self.profile is None:
+            self.profile_frames_left = frames
+            self.profile_path = path
+
+    def recorded(self) -> np.ndarray:
+        """Return the recorded rows, oldest first."""
+        if self.frames <= self.capacity:
+            return self.buffer[:self.frames]
+        start = self.frames % self.capacity
+        return np.concatenate((self.buffer[start:], self.buffer[:start]))
+
+    def stats(self) -> dict[str, tuple[float, float, float]]:
+        """Return (min, avg, p99) seconds of every phase and the frame total over the buffer."""
+        rows = self.recorded()
+        if not len(rows):
+            return {}
+        columns = {name: rows[:, i] for i, name in enumerate(self.phases)}
+        columns["total"] = rows.sum(axis=1)
+        return {name: (float(values.min()), float(values.mean()), float(np.percentile(values, 99)))
+                for name, values in columns.items()}
+
+    def dump_csv(self, path: str = "frame_times.csv"):
+        rows = self.recorded()
+        first_frame = self.frames - len(rows)
+        with open(path, "w", newline="") as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(["frame", *self.phases, "total"])
+            for i, row in enumerate(rows):
+                writer.writerow([first_frame + i, *(f"{value:.6f}" for value in row), f"{row.sum():.6f}"])
+        print(f"Frame times written to {path}")
+
+    def draw_overlay(self, surface: pygame.surface.Surface, position: tuple[int, int] = (4, 4)):
+        """Draw a rolling min/avg/p99 table of the phases, in milliseconds."""
+        if self.font is None:
+            self.font = pygame.font.Font(None, 14)
+
+        rows = [("ms", "min", "avg", "p99")]
+        rows += [(name, *(f"{value * 1000:.2f}" for value in values)) for name, values in self.stats().items()]
+
+        line_height = self.font.get_linesize()
+        # Right edge of the number columns, relative to the overlay
+        column_right = (0, 110, 145, 180)
+        background = pygame.Surface((column_right[-1] + 4, line_height * len(rows) + 4), pygame.SRCALPHA)
+        background.fill((0, 0, 0, 160))
+        surface.blit(background, position)
+        for i, row in enumerate(rows):
+            y = position[1] + 2 + i * line_height
+            for j, cell in enumerate(row):
+                text = self.font.render(cell, True, (230, 230, 230))
+                if j == 0:
+                    surface.blit(text, (position[0] + 2, y))
+                else:
+                    surface.blit(text, text.get_rect(topright=(position[0] + column_right[j], y)))
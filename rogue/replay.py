@@ -0,0 +1,205 @@
+import hashlib
+import json
+import statistics
+import time
+from typing import Optional
+
+import numpy as np
+
+from rogue.enums import Direction
+
+# Bump whenever the layout of the saved arrays changes
+REPLAY_VERSION = 1
+
+
+def checksum(game) -> str:
+    """Return a short hash of the game state, equal game states give equal checksums."""
+    tilemap = game.tilemap
+    player = game.player
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(np.array([game.floor, game.turn, *player.tile_position, player.rect.x, player.rect.y],
+                           dtype=np.int64).tobytes())
+    digest.update(np.array([(*enemy.tile_position, enemy.rect.x, enemy.rect.y, enemy.ai_state.value,
+                             enemy.round_state.value) for enemy in tilemap.enemies], dtype=np.int64).tobytes())
+    digest.update(tilemap.all_tiles.tobytes(order="F"))
+    digest.update(np.packbits(tilemap.explored_tiles.ravel(order="F")).tobytes())
+    return digest.hexdigest()
+
+
+class InputLog:
+    """The input a session consumed frame by frame, together with what is needed to start it again.
+
+    settings are the Game arguments the session was started with. Per frame there is the
+    movement direction, dt and whether a pending AI plan was committed in that frame, the
+    one thing a worker thread decides. Key presses are (frame, key) rows.
+    """
+
+    def __init__(self, settings: dict, directions: np.ndarray, dts: np.ndarray, committed: np.ndarray,
+                 keys: np.ndarray, final_checksum: str):
+        self.settings = settings
+        self.directions = directions
+        self.dts = dts
+        self.committed = committed
+        self.keys = keys
+        self.final_checksum = final_checksum
+
+    @property
+    def frames(self) -> int:
+        return len(self.dts)
+
+    def save(self, path: str):
+        np.savez_compressed(
+            path,
+            version=np.int32(REPLAY_VERSION),
+            settings=np.array(json.dumps(self.settings)),
+            directions=self.directions,
+            dts=self.dts,
+            committed=np.packbits(self.committed),
+            keys=self.keys,
+            checksum=np.array(self.final_checksum),
+        )
+
+    @staticmethod
+    def load(path: str) -> "InputLog":
+        with np.load(path) as data:
+            if int(data["version"]) != REPLAY_VERSION:
+                raise ValueError(f"{path} is a version {int(data['version'])} replay, expected {REPLAY_VERSION}")
+            dts = data["dts"]
+            return InputLog(
+                settings=json.loads(str(data["settings"])),
+                directions=data["directions"],
+                dts=dts,
+                committed=np.unpackbits(data["committed"], count=len(dts)).astype(bool),
+                keys=data["keys"],
+                final_checksum=str(data["checksum"]),
+            )
+
+
+class InputRecorder:
+    """Collects what the game consumes every frame, see InputLog."""
+
+    def __init__(self, settings: dict):
+        self.settings = settings
+        self.directions: list[int] = []
+        self.dts: list[float] = []
+        self.committed: list[bool] = []
+        self.keys: list[tuple[int, int]] = []
+
+    def begin_frame(self, dt: float):
+        self.directions.append(Direction.NULL.value)
+        self.dts.append(dt)
+        self.committed.append(False)
+
+    def record_input(self, keys: list[int], direction: Direction):
+        frame = len(self.dts) - 1
+        self.keys += [(frame, key) for key in keys]
+        self.directions[frame] = direction.value
+
+    def record_commit(self, committed: bool):
+        self.committed[-1] = committed
+
+    def log(self, game) -> InputLog:
+        return InputLog(
+            self.settings,
+            np.array(self.directions, dtype=np.int8),
+            np.array(self.dts, dtype=np.float64),
+            np.array(self.committed, dtype=bool),
+            np.array(self.keys, dtype=np.int32).reshape(-1, 2),
+            checksum(game),
+        )
+
+
+class Replay:
+    """Feeds a recorded InputLog back to the game frame by frame and times every frame.
+
+    A recorded frame is one simulation tick. Rendering happens once per loop of the
+    real-time game, after as many ticks as are due, so it is timed as a series of its own.
+    """
+
+    def __init__(self, log: InputLog):
+        self.log = log
+        self.frame = -1
+        self.keys_by_frame: dict[int, list[int]] = {}
+        for frame, key in log.keys.tolist():
+            self.keys_by_frame.setdefault(frame, []).append(key)
+
+        self.frame_start = 0.0
+        self.frame_times: list[float] = []
+        self.turns: list[int] = []
+        self.render_start = 0.0
+        self.render_times: list[float] = []
+
+    @property
+    def finished(self) -> bool:
+        return self.frame + 1 >= self.log.frames
+
+    def begin_frame(self) -> float:
+        """Move on to the next frame and return its dt."""
+        self.frame += 1
+        self.frame_start = time.perf_counter()
+        return float(self.log.dts[self.frame])
+
+    def keys(self) -> list[int]:
+        return self.keys_by_frame.get(self.frame, [])
+
+    def direction(self) -> Direction:
+        return Direction(int(self.log.directions[self.frame]))
+
+    def committed(self) -> bool:
+        return bool(self.log.committed[self.frame])
+
+    def end_frame(self, turn: int):
+        self.frame_times.append(time.perf_counter() - self.frame_start)
+        self.turns.append(turn)
+
+    def begin_render(self):
+        self.render_start = time.perf_counter()
+
+    def end_render(self):
+        self.render_times.append(time.perf_counter() - self.render_start)
+
+    def timings(self) -> dict[str, dict[str, float]]:
+        """Return the tick, turn and render times in the format of the benchmark results, so they can be compared.
+
+        Turn times only add up ticks, render times are only there when the replay was rendered.
+        """
+        frame_times = np.array(self.frame_times)
+        # Every frame counts towards the turn it ended in
+        _, turn_index = np.unique(self.turns, return_inverse=True)
+        turn_times = np.bincount(turn_index, weights=frame_times)
+        render_times = np.array(self.render_times)
+        series = [("replay_tick", frame_times), ("replay_turn", turn_times)]
+        if len(render_times):
+            series.append(("replay_render", render_times))
+        results = {}
+        for name, timings in series:
+            results[name] = {
+                "min": float(timings.min()),
+                "median": statistics.median(timings.tolist()),
+                "p99": float(np.percentile(timings, 99)),
+                "max": float(timings.max()),
+                "repeat": len(timings),
+            }
+        total = float(frame_times.sum() + render_times.sum())
+        results["replay_total"] = {"min": total, "median": total, "max": total, "repeat": 1}
+        return results
+
+    def report(self, game, path: Optional[str] = None) -> bool:
+        """Print the timings and whether the final state matches the recording, optionally save them as JSON.
+
+        Returns True when the checksums match.
+        """
+        results = self.timings()
+        for name, result in results.items():
+            print(f"{name:<15} median {result['median'] * 1000:9.3f} ms  max {result['max'] * 1000:9.3f} ms"
+                  f"  over {result['repeat']}")
+        final_checksum = checksum(game)
+        matches = final_checksum == self.log.final_checksum
+        print(f"checksum {final_checksum} {'matches' if matches else 'differs from'} "
+              f"the recording's {self.log.final_checksum}")
+        if path is not None:
+            with open(path, "w") as outfile:
+                json.dump({"meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "checksum": final_checksum,
+                                    "settings": self.log.settings}, "results": results}, outfile, indent=2)
+            print(f"Timings written to {path}")
+        return matches
@@ -0,0 +1,355 @@
+import heapq
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+import tcod
+
+from rogue.enums import IntTiles
+from rogue.rect_room import RectangularRoom
+
+UNREACHABLE = np.iinfo(np.int32).max
+
+
+def region_distances(regions: np.ndarray, region: int, bounds: tuple[slice, slice],
+                     source: tuple[int, int]) -> np.ndarray:
+    """Return the walking distance from source to every tile of a region, within the region's bounds."""
+    cost = (regions[bounds] == region).astype(np.int8)
+    distances = tcod.path.maxarray(cost.shape, dtype=np.int32, order="F")
+    distances[source[0] - bounds[0].start, source[1] - bounds[1].start] = 0
+    tcod.path.dijkstra2d(distances, cost, cardinal=1, diagonal=0, out=distances)
+    return distances
+
+
+class PortalSearch:
+    """A Dijkstra search over the portals, outwards from one target.
+
+    It is only expanded as far as the queries so far needed, the next query
+    picks up where the last one stopped.
+    """
+
+    def __init__(self, target: tuple[int, int]):
+        self.target = target
+        self.distance_to: dict[tuple[int, int], int] = {}
+        # Next tile on the way to the target, a portal or the target itself
+        self.next_tile: dict[tuple[int, int], tuple[int, int]] = {}
+        self.queue: list[tuple[int, tuple[int, int]]] = []
+
+    def push(self, tile: tuple[int, int], distance: int, next_tile: tuple[int, int]):
+        if distance < self.distance_to.get(tile, UNREACHABLE):
+            self.distance_to[tile] = distance
+            self.next_tile[tile] = next_tile
+            heapq.heappush(self.queue, (distance, tile))
+
+
+class RoomGraph:
+    """HPA*-style pathfinding over the rooms of a floor and the corridors between them.
+
+    Every room is an area, and so is every cluster_size square of the corridors outside
+    the rooms. The connected floor of an area is a region. Neighbouring regions are
+    joined by one portal, a pair of adjacent tiles. A path is planned over the portals
+    first, with one search per target that every chaser shares. Only the stretch to the
+    next portal is then refined on the grid, in a window the size of a region.
+
+    Walking distances inside a region are the Manhattan distance when the region fills
+    its bounding rectangle, like an untouched room. Otherwise they are computed on first
+    use and kept until the terrain of that region changes, see invalidate().
+    """
+
+    def __init__(self, all_tiles: np.ndarray, rooms: list[RectangularRoom], cluster_size: int = 16,
+                 search_cache_size: int = 16):
+        self.all_tiles = all_tiles
+        self.size = all_tiles.shape
+        self.cluster_size = cluster_size
+
+        # Area of every tile, rooms first and then one per corridor cluster
+        columns = -(-self.size[1] // cluster_size)
+        xs, ys = np.indices(self.size, dtype=np.int32)
+        self.areas = np.asfortranarray(len(rooms) + xs // cluster_size * columns + ys // cluster_size)
+        self.area_bounds: list[tuple[slice, slice]] = []
+        for room_index, room in enumerate(rooms):
+            self.areas[room.inner] = room_index
+            self.area_bounds.append(room.inner)
+        for cx in range(-(-self.size[0] // cluster_size)):
+            for cy in range(columns):
+                self.area_bounds.append((slice(cx * cluster_size, min((cx + 1) * cluster_size, self.size[0])),
+                                         slice(cy * cluster_size, min((cy + 1) * cluster_size, self.size[1]))))
+
+        self.regions = np.full(self.size, fill_value=-1, dtype=np.int32, order="F")
+        self.region_bounds: dict[int, tuple[slice, slice]] = {}
+        # Regions that fill their bounds, walking distances in them are Manhattan distances
+        self.rectangular: set[int] = set()
+        self.next_region = 0
+        # Portal tiles of every region, and the tiles across every portal tile
+        self.portals: dict[int, list[tuple[int, int]]] = {}
+        self.crossings: dict[tuple[int, int], list[tuple[int, int]]] = {}
+        # Distances from a portal tile to the rest of its region, for the regions that aren't rectangular
+        self.portal_distances: dict[tuple[int, int], np.ndarray] = {}
+        # Neighbouring portals of every portal tile and their distance
+        self.portal_edges: dict[tuple[int, int], list[tuple[tuple[int, int], int]]] = {}
+        self.searches: OrderedDict[tuple[int, int], PortalSearch] = OrderedDict()
+        self.search_cache_size = search_cache_size
+
+        floor_areas = np.bincount(self.areas[all_tiles != IntTiles.WALL], minlength=len(self.area_bounds))
+        # Rooms and open corridor clusters are all floor, they need no flood fill
+        area_sizes = np.array([(xs.stop - xs.start) * (ys.stop - ys.start) for xs, ys in self.area_bounds])
+        for area in np.flatnonzero(floor_areas == area_sizes).tolist():
+            self.add_rectangle(self.area_bounds[area])
+        self.label_areas(np.flatnonzero((floor_areas > 0) & (floor_areas != area_sizes)).tolist())
+        self.find_portals()
+
+    def label_areas(self, areas: list[int]):
+        """Split the floor of every given area into regions, each one connected."""
+        for area in areas:
+            bounds = self.area_bounds[area]
+            floor = (self.areas[bounds] == area) & (self.all_tiles[bounds] != IntTiles.WALL)
+            if floor.all():
+                self.add_rectangle(bounds)
+                continue
+            remaining = floor.copy()
+            cost = floor.astype(np.int8)
+            while remaining.any():
+                x, y = np.argwhere(remaining)[0]
+                distances = tcod.path.maxarray(floor.shape, dtype=np.int32, order="F")
+                distances[x, y] = 0
+                tcod.path.dijkstra2d(distances, cost, cardinal=1, diagonal=0, out=distances)
+                reached = distances != UNREACHABLE
+                remaining &= ~reached
+                self.add_region(bounds, reached)
+
+    def add_rectangle(self, bounds: tuple[slice, slice]):
+        region = self.next_region
+        self.next_region += 1
+        self.regions[bounds] = region
+        self.region_bounds[region] = bounds
+        self.rectangular.add(region)
+
+    def add_region(self, bounds: tuple[slice, slice], tiles: np.ndarray):
+        region = self.next_region
+        self.next_region += 1
+        self.regions[bounds][tiles] = region
+        lx, ly = np.nonzero(tiles)
+        x0, y0 = bounds[0].start, bounds[1].start
+        x1, x2, y1, y2 = int(lx.min()), int(lx.max()) + 1, int(ly.min()), int(ly.max()) + 1
+        self.region_bounds[region] = (slice(x0 + x1, x0 + x2), slice(y0 + y1, y0 + y2))
+        if len(lx) == (x2 - x1) * (y2 - y1):
+            self.rectangular.add(region)
+
+    def find_portals(self, window: Optional[tuple[slice, slice]] = None, first_new: int = 0) -> set[int]:
+        """Join every pair of neighbouring regions at the middle of the tiles they share.
+
+        With a window, only the pairs inside it that involve a region numbered first_new
+        or higher are joined, and the regions that got a portal are returned.
+        """
+        if window is None:
+            window = (slice(0, self.size[0]), slice(0, self.size[1]))
+            self.portals = {}
+            self.crossings = {}
+        x0, y0 = window[0].start, window[1].start
+        regions = self.regions[window]
+        width, height = regions.shape
+        lows, highs, low_tiles, high_tiles = [], [], [], []
+        for dx, dy in ((1, 0), (0, 1)):
+            here = regions[:width - dx, :height - dy]
+            there = regions[dx:, dy:]
+            shared = (here >= 0) & (there >= 0) & (here != there) & ((here >= first_new) | (there >= first_new))
+            lx, ly = np.nonzero(shared)
+            a, b = here[lx, ly], there[lx, ly]
+            lx, ly = lx + x0, ly + y0
+            a_tiles, b_tiles = np.stack((lx, ly), axis=1), np.stack((lx + dx, ly + dy), axis=1)
+            swap = (a > b)[:, None]
+            lows.append(np.minimum(a, b))
+            highs.append(np.maximum(a, b))
+            low_tiles.append(np.where(swap, b_tiles, a_tiles))
+            high_tiles.append(np.where(swap, a_tiles, b_tiles))
+        lows, highs = np.concatenate(lows).astype(np.int64), np.concatenate(highs).astype(np.int64)
+        low_tiles, high_tiles = np.concatenate(low_tiles), np.concatenate(high_tiles)
+
+        # Sort the shared tiles by region pair and take the middle one of every pair
+        keys = lows * self.next_region + highs
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        ends = np.append(starts[1:], len(keys))
+        middle = order[(starts + ends) // 2]
+
+        joined = set()
+        for a, b, tile_a, tile_b in zip(lows[middle].tolist(), highs[middle].tolist(),
+                                        map(tuple, low_tiles[middle].tolist()),
+                                        map(tuple, high_tiles[middle].tolist())):
+            for region, tile, across in ((a, tile_a, tile_b), (b, tile_b, tile_a)):
+                if tile not in self.crossings:
+                    self.portals.setdefault(region, []).append(tile)
+                self.crossings.setdefault(tile, []).append(across)
+                joined.add(region)
+        return joined
+
+    def remove_portals(self, region: int) -> set[int]:
+        """Drop the portals of a region and their other ends, return the neighbouring regions that lost one."""
+        neighbours = set()
+        for tile in self.portals.pop(region, []):
+            self.portal_distances.pop(tile, None)
+            self.portal_edges.pop(tile, None)
+            for across in self.crossings.pop(tile):
+                others = self.crossings[across]
+                others.remove(tile)
+                neighbour = int(self.regions[across])
+                neighbours.add(neighbour)
+                if not others:
+                    del self.crossings[across]
+                    self.portals[neighbour].remove(across)
+                    self.portal_distances.pop(across, None)
+                    self.portal_edges.pop(across, None)
+        return neighbours
+
+    def invalidate(self, window: tuple[slice, slice]):
+        """Rebuild the regions of every area that overlaps a window whose terrain changed.
+
+        Only the portals of those regions are searched again, and only the cached
+        edges of their neighbours are dropped.
+        """
+        xs, ys = window
+        # A change on an area's edge can also join or split its neighbour's portals
+        x1, x2 = max(0, xs.start - 1), min(self.size[0], xs.stop + 1)
+        y1, y2 = max(0, ys.start - 1), min(self.size[1], ys.stop + 1)
+        areas = sorted(set(self.areas[x1:x2, y1:y2].ravel().tolist()))
+        stale = set()
+        for area in areas:
+            bounds = self.area_bounds[area]
+            stale.update(self.regions[bounds][self.areas[bounds] == area].tolist())
+        stale.discard(-1)
+
+        touched = set()
+        for region in stale:
+            touched |= self.remove_portals(region)
+        for area in areas:
+            bounds = self.area_bounds[area]
+            self.regions[bounds][self.areas[bounds] == area] = -1
+        for region in stale:
+            del self.region_bounds[region]
+            self.rectangular.discard(region)
+
+        first_new = self.next_region
+        self.label_areas(areas)
+        # Every tile next to a relabeled area, the new regions can't have portals anywhere else
+        bounds = [self.area_bounds[area] for area in areas]
+        x1, x2 = max(0, min(b[0].start for b in bounds) - 1), min(self.size[0], max(b[0].stop for b in bounds) + 1)
+        y1, y2 = max(0, min(b[1].start for b in bounds) - 1), min(self.size[1], max(b[1].stop for b in bounds) + 1)
+        touched |= self.find_portals((slice(x1, x2), slice(y1, y2)), first_new)
+
+        # An edge list holds every other portal of its region, so it is stale once that set changes
+        for region in touched - stale:
+            for tile in self.portals.get(region, []):
+                self.portal_edges.pop(tile, None)
+        self.searches.clear()
+
+    def distances(self, tile: tuple[int, int], others: list[tuple[int, int]]) -> list[int]:
+        """Return the walking distance from tile to every one of others, all in the same region."""
+        region = int(self.regions[tile])
+        if region in self.rectangular:
+            return [abs(x - tile[0]) + abs(y - tile[1]) for x, y in others]
+        distances = self.portal_distances.get(tile)
+        if distances is None:
+            distances = region_distances(self.regions, region, self.region_bounds[region], tile)
+            if tile in self.crossings:
+                self.portal_distances[tile] = distances
+        x0, y0 = self.region_bounds[region][0].start, self.region_bounds[region][1].start
+        return [int(distances[x - x0, y - y0]) for x, y in others]
+
+    def search(self, target: tuple[int, int]) -> PortalSearch:
+        """Return the portal search towards target, started on first use."""
+        search = self.searches.get(target)
+        if search is not None:
+            self.searches.move_to_end(target)
+            return search
+
+        search = PortalSearch(target)
+        portals = self.portals.get(int(self.regions[target]), [])
+        for portal, distance in zip(portals, self.distances(target, portals)):
+            search.push(portal, distance, target)
+        self.searches[target] = search
+        if len(self.searches) > self.search_cache_size:
+            self.searches.popitem(last=False)
+        return search
+
+    def edges(self, tile: tuple[int, int]) -> list[tuple[tuple[int, int], int]]:
+        """Return the portals one step away from a portal tile and their distance, memoized."""
+        edges = self.portal_edges.get(tile)
+        if edges is None:
+            # Stepping across the portal, or walking to another portal of the same region
+            edges = [(across, 1) for across in self.crossings[tile]]
+            portals = self.portals[int(self.regions[tile])]
+            edges += [(portal, cost) for portal, cost in zip(portals, self.distances(tile, portals))
+                      if portal != tile and cost != UNREACHABLE]
+            self.portal_edges[tile] = edges
+        return edges
+
+    def expand(self, search: PortalSearch, bound: int, stop_at: dict[tuple[int, int], int]):
+        """Settle the portals closer to the target than bound, or until one of stop_at is settled."""
+        queue = search.queue
+        distance_to = search.distance_to
+        while queue and queue[0][0] < bound:
+            distance, tile = heapq.heappop(queue)
+            if distance > distance_to[tile]:
+                continue
+            for neighbour, cost in self.edges(tile):
+                if distance + cost < distance_to.get(neighbour, UNREACHABLE):
+                    distance_to[neighbour] = distance + cost
+                    search.next_tile[neighbour] = tile
+                    heapq.heappush(queue, (distance + cost, neighbour))
+            if tile in stop_at:
+                return
+
+    def waypoint(self, start: tuple[int, int], target: tuple[int, int]) -> Optional[tuple[int, int]]:
+        """Return the tile to walk to first on the way from start to target, None if there is no way."""
+        region = int(self.regions[start])
+        if region < 0 or self.regions[target] < 0:
+            return None
+        if region == self.regions[target]:
+            return target
+
+        search = self.search(target)
+        portals = self.portals.get(region, [])
+        if not portals:
+            return None
+        from_start = dict(zip(portals, self.distances(start, portals)))
+        nearest = min(from_start.values())
+        while True:
+            best = min(portals, key=lambda portal: from_start[portal] + search.distance_to.get(portal, UNREACHABLE))
+            best_distance = from_start[best] + search.distance_to.get(best, UNREACHABLE)
+            # Nothing left in the queue can lead to a shorter way out of this region
+            if not search.queue or search.queue[0][0] + nearest >= best_distance:
+                break
+            self.expand(search, best_distance - nearest, from_start)
+
+        if best not in search.distance_to:
+            return None
+        if best == start:
+            return search.next_tile[best]
+        return best
+
+    def refine(self, start: tuple[int, int], waypoint: tuple[int, int],
+               cost_map: Callable[[tuple[slice, slice]], np.ndarray]) -> list[tuple[int, int]]:
+        """Return the grid path from start to waypoint, without start, searched in the window around both.
+
+        cost_map returns the movement costs of a window of the map.
+        """
+        bounds = self.region_bounds[int(self.regions[start])]
+        x1 = max(0, min(bounds[0].start, waypoint[0]) - 1)
+        x2 = min(self.size[0], max(bounds[0].stop, waypoint[0] + 1) + 1)
+        y1 = max(0, min(bounds[1].start, waypoint[1]) - 1)
+        y2 = min(self.size[1], max(bounds[1].stop, waypoint[1] + 1) + 1)
+
+        graph = tcod.path.SimpleGraph(cost=cost_map((slice(x1, x2), slice(y1, y2))), cardinal=2, diagonal=0)
+        pathfinder = tcod.path.Pathfinder(graph)
+        pathfinder.add_root((start[0] - x1, start[1] - y1))
+        path = pathfinder.path_to((waypoint[0] - x1, waypoint[1] - y1))[1:].tolist()
+        return [(x + x1, y + y1) for x, y in path]
+
+    def path_to(self, start: tuple[int, int], target: tuple[int, int],
+                cost_map: Callable[[tuple[slice, slice]], np.ndarray]) -> list[tuple[int, int]]:
+        """Return the path from start to the next waypoint towards target, empty if target can't be reached."""
+        waypoint = self.waypoint(start, target)
+        if waypoint is None:
+            return []
+        return self.refine(start, waypoint, cost_map)
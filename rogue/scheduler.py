@@ -0,0 +1,76 @@
+# Energy an action costs, and what an actor of normal speed gains per player turn
+ACTION_COST = 100
+NORMAL_SPEED = 100
+# Columns and rows from the player in which enemies act: half of the 40x20 tile screen and a margin of 3
+ACTIVATION_RANGE = (23, 13)
+
+
+class TurnScheduler:
+    """Decides which enemies act after a player turn, and in what order.
+
+    Time advances by ACTION_COST per player turn and every actor acts whenever it
+    reaches the time of its next action, ACTION_COST / speed turns after the last
+    one. An action is a step animated over the turn, so an actor acts at most once
+    per turn: one faster than NORMAL_SPEED acts every turn, just like a normal one,
+    and doesn't bank the energy it has left over.
+
+    Only actors within activation_range of the player, a rectangle covering the
+    screen and a margin, are looked at at all, found through the occupancy grid
+    instead of a pass over every enemy. An actor that was out of range catches up
+    lazily when it comes back: the turns it missed are forfeited and it acts right away.
+
+    It also counts the actors that are still moving, so the end of a turn is a
+    single comparison instead of a poll of every enemy.
+    """
+
+    def __init__(self, activation_range: tuple[int, int] = ACTIVATION_RANGE):
+        self.activation_range = activation_range
+        self.turn = 0
+        self.time = 0.0
+        # Time of every actor's next action and the last turn it was in range
+        self.next_action: dict[object, float] = {}
+        self.last_turn: dict[object, int] = {}
+        self.moving = 0
+
+    def take_turn(self, player, occupancy) -> list:
+        """Advance time by one player turn and return the actors whose turn it is, in the order they act.
+
+        The actor waiting longest goes first, then the closest one.
+        """
+        self.turn += 1
+        self.time += ACTION_COST
+        queue = []
+        for actor in occupancy.in_range(player.tile_position, self.activation_range):
+            if actor is player:
+                continue
+            next_action = self.next_action.get(actor, self.time)
+            if self.last_turn.get(actor) != self.turn - 1:
+                # Out of range last turn, the turns it missed are not replayed and it acts once now
+                next_action = self.time
+            self.last_turn[actor] = self.turn
+            if next_action <= self.time:
+                queue.append((next_action, actor.simple_distance_to(player), len(queue), actor))
+        queue.sort()
+
+        acting = []
+        for next_action, _, _, actor in queue:
+            acting.append(actor)
+            # Never earlier than the next turn, a fast actor can't save up actions
+            self.next_action[actor] = max(next_action + ACTION_COST * NORMAL_SPEED / actor.speed, self.time)
+        return acting
+
+    def forget(self, actor):
+        """Drop an actor that left the map, settling its movement if it was underway."""
+        self.next_action.pop(actor, None)
+        self.last_turn.pop(actor, None)
+        if actor.target_position is not None:
+            self.finished_moving()
+
+    def started_moving(self):
+        self.moving += 1
+
+    def finished_moving(self):
+        self.moving -= 1
+
+    def all_done(self) -> bool:
+        return self.moving == 0
@@ -0,0 +1,176 @@
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from rogue.autotile import compute_autotile_indices
+from rogue.enums import AIRoundState, AIState, Direction
+from rogue.generation import LevelData
+from rogue.rect_room import RectangularRoom
+
+# Bump whenever the layout of the saved arrays changes
+SNAPSHOT_VERSION = 1
+
+
+class Snapshot:
+    """The data state of a running game, plain arrays and numbers without any pygame objects.
+
+    Sprites are rebuilt from the shared tile and character images on restore, no pixels are saved.
+    """
+
+    def __init__(self, seed: int, floor: int, turn: int, all_tiles: np.ndarray, explored_tiles: np.ndarray,
+                 visible_tiles: np.ndarray, rooms: np.ndarray, player_position: tuple[int, int],
+                 player_facing: int, enemy_positions: np.ndarray, enemy_ai_states: np.ndarray,
+                 enemy_round_states: np.ndarray, enemy_facing: np.ndarray):
+        self.seed = seed
+        self.floor = floor
+        self.turn = turn
+        self.all_tiles = all_tiles
+        self.explored_tiles = explored_tiles
+        self.visible_tiles = visible_tiles
+        # One (x1, y1, x2, y2) row per room
+        self.rooms = rooms
+        self.player_position = player_position
+        self.player_facing = player_facing
+        # One row or entry per enemy
+        self.enemy_positions = enemy_positions
+        self.enemy_ai_states = enemy_ai_states
+        self.enemy_round_states = enemy_round_states
+        self.enemy_facing = enemy_facing
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return self.all_tiles.shape
+
+    def level(self) -> LevelData:
+        """Return the floor as a level without spawn points, the enemies are restored separately."""
+        rooms = [RectangularRoom(x1, y1, x2 - x1, y2 - y1) for x1, y1, x2, y2 in self.rooms.tolist()]
+        return LevelData(self.size, self.seed, self.all_tiles, compute_autotile_indices(self.all_tiles), rooms,
+                         self.player_position, [])
+
+
+def capture(game) -> Snapshot:
+    """Copy the data state of the game, cheap enough to do between two frames."""
+    tilemap = game.tilemap
+    enemies = tilemap.enemies
+    return Snapshot(
+        seed=game.seed,
+        floor=game.floor,
+        turn=game.turn,
+        all_tiles=tilemap.all_tiles.copy(order="F"),
+        explored_tiles=tilemap.explored_tiles.copy(order="F"),
+        visible_tiles=tilemap.visible_tiles.copy(order="F"),
+        rooms=np.array([(r.x1, r.y1, r.x2, r.y2) for r in tilemap.rooms], dtype=np.int32).reshape(-1, 4),
+        player_position=game.player.tile_position,
+        player_facing=game.player.facing_direction.value,
+        enemy_positions=np.array([enemy.tile_position for enemy in enemies], dtype=np.int32).reshape(-1, 2),
+        enemy_ai_states=np.array([enemy.ai_state.value for enemy in enemies], dtype=np.int8),
+        enemy_round_states=np.array([enemy.round_state.value for enemy in enemies], dtype=np.int8),
+        enemy_facing=np.array([enemy.facing_direction.value for enemy in enemies], dtype=np.int8),
+    )
+
+
+def write(snapshot: Snapshot, path: str):
+    """Write the snapshot as an uncompressed .npz, the boolean maps packed to one bit per tile."""
+    # Write to a temporary file first so a crash mid save never destroys the previous save
+    temporary_path = path + ".tmp.npz"
+    np.savez(
+        temporary_path,
+        version=np.int32(SNAPSHOT_VERSION),
+        header=np.array([snapshot.seed, snapshot.floor, snapshot.turn, snapshot.player_facing], dtype=np.int64),
+        all_tiles=snapshot.all_tiles,
+        explored_tiles=np.packbits(snapshot.explored_tiles.ravel(order="F")),
+        visible_tiles=np.packbits(snapshot.visible_tiles.ravel(order="F")),
+        rooms=snapshot.rooms,
+        player_position=np.array(snapshot.player_position, dtype=np.int32),
+        enemy_positions=snapshot.enemy_positions,
+        enemy_ai_states=snapshot.enemy_ai_states,
+        enemy_round_states=snapshot.enemy_round_states,
+        enemy_facing=snapshot.enemy_facing,
+    )
+    os.replace(temporary_path, path)
+
+
+def read(path: str) -> Snapshot:
+    with np.load(path) as data:
+        if int(data["version"]) != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is a version {int(data['version'])} snapshot, expected {SNAPSHOT_VERSION}")
+        all_tiles = np.asfortranarray(data["all_tiles"])
+        count = all_tiles.size
+        seed, floor, turn, player_facing = data["header"].tolist()
+        return Snapshot(
+            seed=seed,
+            floor=floor,
+            turn=turn,
+            all_tiles=all_tiles,
+            explored_tiles=np.unpackbits(data["explored_tiles"], count=count).astype(bool).reshape(
+                all_tiles.shape, order="F"),
+            visible_tiles=np.unpackbits(data["visible_tiles"], count=count).astype(bool).reshape(
+                all_tiles.shape, order="F"),
+            rooms=data["rooms"],
+            player_position=tuple(data["player_position"].tolist()),
+            player_facing=player_facing,
+            enemy_positions=data["enemy_positions"],
+            enemy_ai_states=data["enemy_ai_states"],
+            enemy_round_states=data["enemy_round_states"],
+            enemy_facing=data["enemy_facing"],
+        )
+
+
+def restore(game, snapshot: Snapshot):
+    """Rebuild the floor, the player and the enemies of a snapshot in a running game."""
+    game.seed = snapshot.seed
+    game.floor = snapshot.floor
+    game.turn = snapshot.turn
+    game.screen_tile_size = snapshot.size
+    game.start_floor(snapshot.level())
+    game.player.facing_direction = Direction(snapshot.player_facing)
+
+    tilemap = game.tilemap
+    for position, ai_state, round_state, facing in zip(snapshot.enemy_positions.tolist(),
+                                                        snapshot.enemy_ai_states.tolist(),
+                                                        snapshot.enemy_round_states.tolist(),
+                                                        snapshot.enemy_facing.tolist()):
+        enemy = tilemap.spawn_enemy(game.enemy_group, tuple(position))
+        enemy.ai_state = AIState(ai_state)
+        enemy.round_state = AIRoundState(round_state)
+        enemy.facing_direction = Direction(facing)
+        if enemy.actor_store is not None:
+            enemy.actor_store.round_state[enemy.store_index] = round_state
+            enemy.actor_store.facing[enemy.store_index] = facing
+
+    # The visible tiles follow from the player's position and were just recomputed by start_floor
+    tilemap.explored_tiles |= snapshot.explored_tiles
+    tilemap.tilemap_states[:] = tilemap.explored_tiles.astype(int) + tilemap.visible_tiles
+    tilemap.tile_layer.update(tilemap.tilemap_states)
+
+
+class Autosaver:
+    """Writes snapshots on a background thread, the caller only pays for copying the arrays."""
+
+    def __init__(self, path: str = "autosave.npz"):
+        self.path = path
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.pending: Optional[Future] = None
+        self.saved_turn = -1
+
+    def save(self, game) -> bool:
+        """Start saving the game, unless the previous save is still being written. Return True if started."""
+        if self.pending is not None:
+            if not self.pending.done():
+                return False
+            # Surface errors of the previous save here instead of losing them
+            self.pending.result()
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="autosave")
+        self.pending = self.executor.submit(write, capture(game), self.path)
+        self.saved_turn = game.turn
+        return True
+
+    def shutdown(self):
+        """Wait for the last save to be written."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        self.pending = None
@@ -0,0 +1,155 @@
+from typing import Optional
+
+import numpy as np
+import pygame
+
+from rogue.enums import TileState
+
+BACKGROUND_COLOR = (13, 13, 13)
+
+
+class TileStateImages:
+    """What every autotile index looks like in every TileState, one table shared by all maps.
+
+    images[state][index] is the image to blit. Unexplored tiles look like the background,
+    so that row holds one and the same surface. The explored images have the shade baked
+    in and the visible ones are the tile images themselves.
+    """
+
+    def __init__(self, tile_images: dict[int, pygame.surface.Surface], tile_size: int = 16):
+        self.tile_images = tile_images
+        count = max(tile_images) + 1
+
+        unexplored = pygame.Surface((tile_size, tile_size))
+        unexplored.fill(BACKGROUND_COLOR)
+        # Drawing this over a visible tile gives the same result as the explored tile at alpha 100
+        shade = pygame.Surface((tile_size, tile_size))
+        shade.fill(BACKGROUND_COLOR)
+        shade.set_alpha(255 - 100)
+        explored = []
+        for idx in range(count):
+            # Opaque like the chunks, so the shade blends exactly as it did over a baked chunk
+            image = unexplored.copy()
+            image.blit(tile_images[idx], (0, 0))
+            image.blit(shade, (0, 0))
+            explored.append(image)
+
+        self.images: list[list[pygame.surface.Surface]] = [None] * len(TileState)
+        self.images[TileState.UNEXPLORED] = [unexplored] * count
+        self.images[TileState.EXPLORED] = explored
+        self.images[TileState.VISIBLE] = [tile_images[idx] for idx in range(count)]
+
+    def stats(self) -> dict[str, int]:
+        surfaces = {id(image): image for row in self.images for image in row}.values()
+        return {
+            "surfaces": len(surfaces),
+            "bytes": sum(s.get_width() * s.get_height() * s.get_bytesize() for s in surfaces),
+        }
+
+
+class TileLayer:
+    """Static terrain pre-baked into chunk surfaces.
+
+    A chunk is re-baked only when the state of one of its tiles changed, and only
+    the chunks overlapping the screen are blitted.
+    """
+
+    def __init__(self, state_images: TileStateImages, tile_indices: np.ndarray, chunk_size: int = 16,
+                 tile_size: int = 16):
+        self.state_images = state_images
+        self.tile_indices = tile_indices
+        self.chunk_size = chunk_size
+        self.tile_size = tile_size
+        self.size = tile_indices.shape
+        self.chunk_count = (-(-self.size[0] // chunk_size), -(-self.size[1] // chunk_size))
+
+        # Missing chunks render as unexplored, so that is the initial baked state
+        self.baked_states = np.full(self.size, fill_value=TileState.UNEXPLORED, dtype=np.int8, order="F")
+        # Chunks that never had an explored tile are not stored, the screen fill covers them
+        self.chunks: dict[tuple[int, int], pygame.surface.Surface] = {}
+        # Chunks whose tile indices changed since they were baked
+        self.stale_chunks: set[tuple[int, int]] = set()
+
+    def chunk_slices(self, cx: int, cy: int) -> tuple[slice, slice]:
+        return (slice(cx * self.chunk_size, min((cx + 1) * self.chunk_size, self.size[0])),
+                slice(cy * self.chunk_size, min((cy + 1) * self.chunk_size, self.size[1])))
+
+    def dirty_chunks(self, tilemap_states: np.ndarray,
+                     region: Optional[tuple[slice, slice]] = None) -> list[tuple[int, int]]:
+        xs, ys = region if region is not None else (slice(0, self.size[0]), slice(0, self.size[1]))
+        lx, ly = np.nonzero(tilemap_states[xs, ys] != self.baked_states[xs, ys])
+        chunk_keys = ((lx + xs.start) // self.chunk_size * self.chunk_count[1]
+                      + (ly + ys.start) // self.chunk_size)
+        # A set rather than np.unique, whose first call pulls in numpy.ma and delays the first frame
+        return [divmod(key, self.chunk_count[1]) for key in sorted(set(chunk_keys.tolist()))]
+
+    def update(self, tilemap_states: np.ndarray, region: Optional[tuple[slice, slice]] = None) -> list[tuple[int, int]]:
+        """Re-bake the chunks whose tile states changed, return their coordinates.
+
+        If region is given, changes are only looked for inside it.
+        """
+        dirty = self.dirty_chunks(tilemap_states, region)
+        for cx, cy in dirty:
+            self.bake_chunk(cx, cy, tilemap_states)
+        return dirty
+
+    def invalidate(self, window: tuple[slice, slice]):
+        """Mark the chunks overlapping a window whose tile indices changed, bake_stale() re-bakes them."""
+        xs, ys = window
+        # Unexplored tiles all look the same, whatever their index
+        if not self.baked_states[xs, ys].any():
+            return
+        for cx in range(xs.start // self.chunk_size, (xs.stop - 1) // self.chunk_size + 1):
+            for cy in range(ys.start // self.chunk_size, (ys.stop - 1) // self.chunk_size + 1):
+                self.stale_chunks.add((cx, cy))
+
+    def bake_stale(self, tilemap_states: np.ndarray) -> list[tuple[int, int]]:
+        """Re-bake the chunks marked by invalidate(), return their coordinates."""
+        stale = sorted(self.stale_chunks)
+        self.stale_chunks.clear()
+        for cx, cy in stale:
+            self.bake_chunk(cx, cy, tilemap_states)
+        return stale
+
+    def bake_chunk(self, cx: int, cy: int, tilemap_states: np.ndarray):
+        xs, ys = self.chunk_slices(cx, cy)
+        states = tilemap_states[xs, ys]
+        self.baked_states[xs, ys] = states
+
+        chunk = self.chunks.get((cx, cy))
+        if chunk is None:
+            if not states.any():
+                return
+            chunk = pygame.Surface(((xs.stop - xs.start) * self.tile_size, (ys.stop - ys.start) * self.tile_size))
+            self.chunks[(cx, cy)] = chunk
+        chunk.fill(BACKGROUND_COLOR)
+
+        # The background fill already is what unexplored tiles look like
+        lx, ly = np.nonzero(states != TileState.UNEXPLORED)
+        indices = self.tile_indices[xs, ys][lx, ly].tolist()
+        tile_states = states[lx, ly].tolist()
+        images = self.state_images.images
+        ts = self.tile_size
+        chunk.blits([(images[state][idx], (x * ts, y * ts))
+                     for x, y, state, idx in zip(lx.tolist(), ly.tolist(), tile_states, indices)], doreturn=False)
+
+    def nbytes(self) -> int:
+        """Return the pixel memory of the baked chunks."""
+        return sum(c.get_width() * c.get_height() * c.get_bytesize() for c in self.chunks.values())
+
+    def draw(self, surface: pygame.surface.Surface, camera_position: pygame.Vector2):
+        """Blit the chunks that intersect the surface, with the map offset by camera_position."""
+        chunk_pixels = self.chunk_size * self.tile_size
+        offset_x, offset_y = int(camera_position.x), int(camera_position.y)
+        first_x = max(0, -offset_x // chunk_pixels)
+        first_y = max(0, -offset_y // chunk_pixels)
+        last_x = min(self.chunk_count[0] - 1, (surface.get_width() - offset_x) // chunk_pixels)
+        last_y = min(self.chunk_count[1] - 1, (surface.get_height() - offset_y) // chunk_pixels)
+
+        blit_sequence = []
+        for cx in range(first_x, last_x + 1):
+            for cy in range(first_y, last_y + 1):
+                chunk = self.chunks.get((cx, cy))
+                if chunk is not None:
+                    blit_sequence.append((chunk, (cx * chunk_pixels + offset_x, cy * chunk_pixels + offset_y)))
+        surface.blits(blit_sequence, doreturn=False)
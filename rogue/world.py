@@ -0,0 +1,288 @@
+import os
+import random
+import tempfile
+from collections import OrderedDict
+from os.path import join
+from typing import Optional
+
+import numpy as np
+import pygame
+
+from rogue.autotile import compute_autotile_indices
+from rogue.enums import IntTiles
+from rogue.generation import LevelData, carve_tunnel, generate_dungeon, generate_spawn_points
+from rogue.map import TileMap
+from rogue.occupancy import OccupancyGrid
+
+
+class Chunk:
+    """Terrain and exploration of one square piece of a streamed world, in chunk-local coordinates."""
+
+    def __init__(self, all_tiles: np.ndarray, explored_tiles: np.ndarray, hub: tuple[int, int],
+                 spawn_points: list[tuple[int, int]], spawned: bool = False):
+        self.all_tiles = all_tiles
+        self.explored_tiles = explored_tiles
+        # Floor tile every doorway of the chunk is connected to
+        self.hub = hub
+        self.spawn_points = spawn_points
+        self.spawned = spawned
+        # Set when it differs from what generate_chunk gives, so it has to be written out on eviction
+        self.modified = False
+
+    @property
+    def nbytes(self) -> int:
+        return self.all_tiles.nbytes + self.explored_tiles.nbytes
+
+
+def generate_chunk(seed: int, cx: int, cy: int, chunk_size: int, max_rooms: int = 50, room_min_size: int = 3,
+                   room_max_size: int = 6) -> Chunk:
+    """Generate one chunk, the same seed and coordinates always give the same chunk.
+
+    Every chunk digs a tunnel from its first room to a doorway in the middle of each
+    edge, the neighbour's doorway is the tile right across, so any generation order
+    gives a connected world.
+    """
+    rng = random.Random(f"{seed}:{cx}:{cy}")
+    all_tiles = np.full((chunk_size, chunk_size), fill_value=IntTiles.WALL, dtype=np.int8, order="F")
+    rooms, hub = generate_dungeon(all_tiles, rng, max_rooms, room_min_size, room_max_size)
+    middle = chunk_size // 2
+    for doorway in ((middle, 0), (chunk_size - 1, middle), (middle, chunk_size - 1), (0, middle)):
+        carve_tunnel(all_tiles, hub, doorway, rng)
+    spawn_points = generate_spawn_points(rooms, rng, hub)
+    return Chunk(all_tiles, np.zeros((chunk_size, chunk_size), dtype=bool, order="F"), hub, spawn_points)
+
+
+class ChunkStore:
+    """Chunks of an open-ended world, generated on first use.
+
+    The least recently used chunks beyond memory_budget bytes are dropped, modified ones are
+    first written to directory as compressed .npz files, unmodified ones are simply generated again.
+    """
+
+    def __init__(self, seed: int, chunk_size: int = 32, memory_budget: int = 4 * 1024 * 1024,
+                 directory: Optional[str] = None, **generation_params):
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.memory_budget = memory_budget
+        self.generation_params = generation_params
+        # Without a directory the evicted chunks only live as long as the store
+        self.temporary_directory = tempfile.TemporaryDirectory(prefix="rogue_chunks_") if directory is None else None
+        self.directory = directory if directory is not None else self.temporary_directory.name
+
+        self.chunks: OrderedDict[tuple[int, int], Chunk] = OrderedDict()
+        # Chunks that can't be evicted, the ones copied into the active window
+        self.pinned: set[tuple[int, int]] = set()
+        self.nbytes = 0
+        self.generated = 0
+        self.loaded = 0
+        self.evicted = 0
+
+    def path(self, cx: int, cy: int) -> str:
+        return join(self.directory, f"{self.seed}_{cx}_{cy}.npz")
+
+    def get(self, cx: int, cy: int) -> Chunk:
+        key = (cx, cy)
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+            return chunk
+
+        chunk = self.load(cx, cy)
+        if chunk is None:
+            chunk = generate_chunk(self.seed, cx, cy, self.chunk_size, **self.generation_params)
+            self.generated += 1
+        self.chunks[key] = chunk
+        self.nbytes += chunk.nbytes
+        self.evict()
+        return chunk
+
+    def evict(self):
+        for key in list(self.chunks):
+            if self.nbytes <= self.memory_budget:
+                break
+            if key in self.pinned:
+                continue
+            chunk = self.chunks.pop(key)
+            self.nbytes -= chunk.nbytes
+            if chunk.modified:
+                self.save(key, chunk)
+            self.evicted += 1
+
+    def load(self, cx: int, cy: int) -> Optional[Chunk]:
+        path = self.path(cx, cy)
+        if not os.path.exists(path):
+            return None
+        size = (self.chunk_size, self.chunk_size)
+        with np.load(path) as data:
+            explored_tiles = np.unpackbits(data["explored_tiles"], count=size[0] * size[1]).astype(bool)
+            chunk = Chunk(
+                all_tiles=np.asfortranarray(data["all_tiles"]),
+                explored_tiles=explored_tiles.reshape(size, order="F"),
+                hub=tuple(data["hub"].tolist()),
+                spawn_points=[tuple(point) for point in data["spawn_points"].tolist()],
+                spawned=bool(data["spawned"]),
+            )
+        # Still differs from the generated chunk, the file stays the only other copy
+        chunk.modified = True
+        self.loaded += 1
+        return chunk
+
+    def save(self, key: tuple[int, int], chunk: Chunk):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(*key)
+        temporary_path = path + ".tmp.npz"
+        np.savez_compressed(
+            temporary_path,
+            all_tiles=chunk.all_tiles,
+            explored_tiles=np.packbits(chunk.explored_tiles.ravel(order="F")),
+            hub=np.array(chunk.hub, dtype=np.int32),
+            spawn_points=np.array(chunk.spawn_points, dtype=np.int32).reshape(-1, 2),
+            spawned=np.bool_(chunk.spawned),
+        )
+        os.replace(temporary_path, path)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "chunks": len(self.chunks),
+            "bytes": self.nbytes,
+            "generated": self.generated,
+            "loaded": self.loaded,
+            "evicted": self.evicted,
+        }
+
+
+class StreamedTileMap(TileMap):
+    """A TileMap over an endless world, holding only the chunks around the player.
+
+    The dense arrays cover a window of (2 * view_radius + 1) chunks per side centred on
+    the player's chunk, so FOV, the flow field and the tile layer work unchanged across
+    chunk borders. When the player enters another chunk the window is moved along and
+    everything inside is shifted to the new local coordinates. Enemies left outside
+    the window are dropped.
+    """
+
+    def __init__(self, enemy_group: pygame.sprite.Group, use_actor_store: bool = False, seed: Optional[int] = None,
+                 chunk_size: int = 32, view_radius: int = 1, memory_budget: int = 4 * 1024 * 1024,
+                 directory: Optional[str] = None, max_rooms: int = 50, room_min_size: int = 3,
+                 room_max_size: int = 6):
+        seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.chunk_store = ChunkStore(seed, chunk_size, memory_budget, directory, max_rooms=max_rooms,
+                                      room_min_size=room_min_size, room_max_size=room_max_size)
+        self.chunk_size = chunk_size
+        self.view_radius = view_radius
+        # World chunk coordinates of the window's top left chunk, the player starts in chunk (0, 0)
+        self.window_origin = (-view_radius, -view_radius)
+        span = (2 * view_radius + 1) * chunk_size
+        # The player starts on the hub of chunk (0, 0), the middle one of the window
+        hub = self.chunk_store.get(0, 0).hub
+        player_position = (view_radius * chunk_size + hub[0], view_radius * chunk_size + hub[1])
+        level, explored_tiles = self.assemble_window((span, span), seed, player_position)
+        super().__init__((span, span), enemy_group, use_actor_store, seed, level=level, max_rooms=max_rooms,
+                         room_min_size=room_min_size, room_max_size=room_max_size)
+        self.explored_tiles[:] = explored_tiles
+        self.tilemap_states[:] = explored_tiles
+
+    def window_chunks(self) -> list[tuple[tuple[int, int], tuple[slice, slice]]]:
+        """Return the world coordinates of every chunk in the window and the window slices it covers."""
+        chunks = []
+        side = 2 * self.view_radius + 1
+        for i in range(side):
+            for j in range(side):
+                chunks.append(((self.window_origin[0] + i, self.window_origin[1] + j),
+                               (slice(i * self.chunk_size, (i + 1) * self.chunk_size),
+                                slice(j * self.chunk_size, (j + 1) * self.chunk_size))))
+        return chunks
+
+    def assemble_window(self, size: tuple[int, int], seed: int,
+                        player_position: tuple[int, int]) -> tuple[LevelData, np.ndarray]:
+        """Copy the chunks of the window into dense arrays, return them as a level plus the explored tiles."""
+        all_tiles = np.empty(size, dtype=np.int8, order="F")
+        explored_tiles = np.empty(size, dtype=bool, order="F")
+        spawn_points = []
+        self.chunk_store.pinned = {key for key, _ in self.window_chunks()}
+        for key, (xs, ys) in self.window_chunks():
+            chunk = self.chunk_store.get(*key)
+            all_tiles[xs, ys] = chunk.all_tiles
+            explored_tiles[xs, ys] = chunk.explored_tiles
+            if not chunk.spawned:
+                spawn_points += [(xs.start + x, ys.start + y) for x, y in chunk.spawn_points]
+                chunk.spawned = True
+                chunk.modified = True
+
+        level = LevelData(size, seed, all_tiles, compute_autotile_indices(all_tiles), [], player_position,
+                          spawn_points)
+        return level, explored_tiles
+
+    def store_window(self):
+        """Write the terrain and exploration of the window back into its chunks."""
+        for key, window in self.window_chunks():
+            chunk = self.chunk_store.get(*key)
+            if (np.array_equal(chunk.all_tiles, self.all_tiles[window])
+                    and np.array_equal(chunk.explored_tiles, self.explored_tiles[window])):
+                continue
+            chunk.all_tiles[:] = self.all_tiles[window]
+            chunk.explored_tiles[:] = self.explored_tiles[window]
+            chunk.modified = True
+
+    def update_fov(self, player) -> Optional[tuple[slice, slice]]:
+        self.follow(player)
+        return super().update_fov(player)
+
+    def follow(self, player):
+        """Move the window along when the player's tile is no longer in the middle chunk."""
+        dx = player.tile_position[0] // self.chunk_size - self.view_radius
+        dy = player.tile_position[1] // self.chunk_size - self.view_radius
+        if dx or dy:
+            self.shift_window(dx, dy)
+
+    def shift_window(self, dx: int, dy: int):
+        """Move the window by whole chunks and every entity by the opposite amount."""
+        self.store_window()
+        self.window_origin = (self.window_origin[0] + dx, self.window_origin[1] + dy)
+        tile_offset = (-dx * self.chunk_size, -dy * self.chunk_size)
+        # The start position moves along like everything else, chunk (0, 0) may long be evicted
+        player_position = (self.player_position[0] + tile_offset[0], self.player_position[1] + tile_offset[1])
+        level, explored_tiles = self.assemble_window(self.size, self.seed, player_position)
+        self.load_level(level)
+
+        pixel_offset = (tile_offset[0] * 16, tile_offset[1] * 16)
+        self.occupancy = OccupancyGrid(self.size)
+        if self.actor_store is not None:
+            self.actor_store.shift(pixel_offset)
+        for entity in list(self.entities):
+            x, y = entity.tile_position[0] + tile_offset[0], entity.tile_position[1] + tile_offset[1]
+            if not (0 <= x < self.size[0] and 0 <= y < self.size[1]):
+                self.drop_enemy(entity)
+                continue
+            entity.occupancy = None
+            entity.tile_position = (x, y)
+            entity.float_position += pixel_offset
+            entity.rect.topleft = (entity.rect.x + pixel_offset[0], entity.rect.y + pixel_offset[1])
+            if entity is self.player_ref:
+                if entity.target_position is not None:
+                    entity.target_position = (x, y)
+            else:
+                if entity.target_position is not None:
+                    entity.target_position = (entity.target_position[0] + pixel_offset[0],
+                                              entity.target_position[1] + pixel_offset[1])
+                entity.health_bar.update_based_on_parent_pos(entity.rect)
+            self.occupancy.add(entity)
+
+        self.explored_tiles[:] = explored_tiles
+        self.visible_tiles[:] = False
+        self.tilemap_states[:] = explored_tiles
+        self.fov_origin = None
+        self.fov_window = None
+        self.fov_changed = None
+        self.flow_field = None
+        self.tile_layer.update(self.tilemap_states)
+        self.generate_enemies(self.enemy_group)
+
+    def drop_enemy(self, enemy):
+        self.enemies.remove(enemy)
+        self.entities.remove(enemy)
+        self.scheduler.forget(enemy)
+        if self.actor_store is not None:
+            self.actor_store.remove(enemy)
+        enemy.health_bar.kill()
+        enemy.kill()
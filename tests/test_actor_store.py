@@ -0,0 +1,39 @@
+import pytest
+
+from rogue.main import TICK, Game, RandomWalkInput
+
+
+def play(use_actor_store: bool, frames: int) -> list:
+    game = Game(headless=True, input_source=RandomWalkInput(1), seed=3, use_actor_store=use_actor_store,
+                threaded_ai=False)
+    states = []
+    for _ in range(frames):
+        game.dt = TICK
+        game.update()
+        game.render_screen()
+        states.append([(enemy.rect.x, enemy.rect.y, enemy.round_state, enemy.facing_direction, enemy.tile_position)
+                       for enemy in game.tilemap.enemies])
+    game.prefetcher.shutdown()
+    assert game.turn > 0
+    return states
+
+
+def test_store_moves_enemies_like_their_sprites():
+    per_sprite = play(False, 3000)
+    stored = play(True, 3000)
+    # Somebody has to have walked for the comparison to mean anything
+    assert per_sprite[0] != per_sprite[-1]
+    for frame, (expected, actual) in enumerate(zip(per_sprite, stored)):
+        assert actual == expected, f"frame {frame}"
+
+
+@pytest.mark.parametrize("use_actor_store", [False, True])
+def test_scheduler_counts_moving_enemies(use_actor_store):
+    game = Game(headless=True, input_source=RandomWalkInput(5), seed=3, use_actor_store=use_actor_store,
+                threaded_ai=False)
+    for _ in range(1000):
+        game.dt = TICK
+        game.update()
+        moving = sum(enemy.target_position is not None for enemy in game.tilemap.enemies)
+        assert game.tilemap.scheduler.moving == moving
+    game.prefetcher.shutdown()
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from rogue.autotile import FLOOR_TILE_INDEX, compute_autotile_indices
+from rogue.enums import IntTiles
+
+
+def reference_indices(all_tiles: np.ndarray) -> np.ndarray:
+    """The original per-tile autotiling, a bit string of the 8 neighbours read in reverse."""
+    width, height = all_tiles.shape
+    indices = np.zeros(all_tiles.shape, dtype=np.uint16)
+    for x in range(width):
+        for y in range(height):
+            if all_tiles[x][y] != IntTiles.WALL:
+                indices[x, y] = FLOOR_TILE_INDEX
+                continue
+            neighbor_weights = ""
+            for j in [-1, 0, 1]:
+                for i in [-1, 0, 1]:
+                    if i == 0 and j == 0:
+                        continue
+                    xx, yy = x + i, y + j
+                    if 0 <= xx < width and 0 <= yy < height:
+                        neighbor_weights += "1" if all_tiles[xx][yy] == IntTiles.WALL else "0"
+                    else:
+                        neighbor_weights += "1"
+            indices[x, y] = int(neighbor_weights[::-1], 2)
+    return indices
+
+
+def random_tiles(rng: np.random.Generator, width: int, height: int) -> np.ndarray:
+    return np.asfortranarray(rng.integers(0, 2, (width, height)).astype(np.int8))
+
+
+@pytest.mark.parametrize("size", [(1, 1), (1, 7), (5, 3), (16, 16), (40, 20)])
+def test_matches_reference(size):
+    rng = np.random.default_rng(sum(size))
+    for _ in range(5):
+        all_tiles = random_tiles(rng, *size)
+        assert (compute_autotile_indices(all_tiles) == reference_indices(all_tiles)).all()
+
+
+def test_window_matches_whole_map():
+    rng = np.random.default_rng(2)
+    for _ in range(200):
+        width, height = rng.integers(1, 30, 2)
+        all_tiles = random_tiles(rng, width, height)
+        expected = reference_indices(all_tiles)
+        x1 = int(rng.integers(0, width))
+        x2 = int(rng.integers(x1 + 1, width + 1))
+        y1 = int(rng.integers(0, height))
+        y2 = int(rng.integers(y1 + 1, height + 1))
+        window = (slice(x1, x2), slice(y1, y2))
+        assert (compute_autotile_indices(all_tiles, window) == expected[window]).all()
@@ -0,0 +1,25 @@
+import pygame
+
+from rogue.enums import Direction
+from rogue.main import TICK, Game, RandomWalkInput
+
+
+def make_game(dirty_rendering: bool) -> Game:
+    return Game(headless=True, input_source=RandomWalkInput(4), seed=21, map_size=(60, 40), max_rooms=80,
+                dirty_rendering=dirty_rendering, threaded_ai=False)
+
+
+def test_dirty_frames_match_full_redraws():
+    dirty, full = make_game(True), make_game(False)
+    for frame in range(2000):
+        if frame == 1500:
+            # Idle frames only redraw the animated sprites
+            dirty.input_source = full.input_source = lambda: Direction.NULL
+        for game in (dirty, full):
+            game.dt = TICK
+            game.update()
+            game.render_screen(lead=frame % 3 / 3 * TICK)
+        assert pygame.image.tobytes(dirty.screen, "RGB") == pygame.image.tobytes(full.screen, "RGB"), f"frame {frame}"
+    assert dirty.turn == full.turn > 0
+    for game in (dirty, full):
+        game.prefetcher.shutdown()
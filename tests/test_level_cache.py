@@ -0,0 +1,33 @@
+import numpy as np
+
+from rogue import level_cache as level_cache_module
+from rogue.generation import generate_level
+from rogue.level_cache import LevelCache
+from rogue.prefetch import LevelPrefetcher
+
+
+def test_contains_checks_the_version(tmp_path, monkeypatch):
+    cache = LevelCache(str(tmp_path))
+    assert not cache.contains((40, 20), 3, max_rooms=10)
+    level = generate_level((40, 20), 3, max_rooms=10)
+    cache.save(level, max_rooms=10)
+    assert cache.contains((40, 20), 3, max_rooms=10)
+    assert not cache.contains((40, 20), 4, max_rooms=10)
+    assert np.array_equal(cache.load((40, 20), 3, max_rooms=10).all_tiles, level.all_tiles)
+
+    monkeypatch.setattr(level_cache_module, "GENERATOR_VERSION", level_cache_module.GENERATOR_VERSION + 1)
+    assert not cache.contains((40, 20), 3, max_rooms=10)
+
+
+def test_prefetch_skips_cached_levels_without_loading_them(tmp_path, monkeypatch):
+    cache = LevelCache(str(tmp_path))
+    cache.save(generate_level((40, 20), 3, max_rooms=10), max_rooms=10)
+
+    def load(*args, **kwargs):
+        raise AssertionError("prefetch() read the whole level")
+
+    monkeypatch.setattr(cache, "load", load)
+    prefetcher = LevelPrefetcher(cache)
+    prefetcher.prefetch((40, 20), 3, max_rooms=10)
+    assert prefetcher.executor is None
+    assert prefetcher.progress((40, 20), 3, max_rooms=10)[0] == "missing"
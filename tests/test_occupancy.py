@@ -0,0 +1,25 @@
+from rogue.occupancy import OccupancyGrid
+
+
+class Token:
+    def __init__(self, tile_position: tuple[int, int]):
+        self.tile_position = tile_position
+
+
+def test_in_range_finds_stacked_entities():
+    grid = OccupancyGrid((20, 20))
+    enemy = Token((5, 5))
+    player = Token((5, 5))
+    far = Token((15, 15))
+    for entity in (enemy, player, far):
+        grid.add(entity)
+
+    assert grid.at(5, 5) is player
+    assert set(grid.in_range((5, 6), (0, 1))) == {enemy, player}
+    assert grid.in_range((12, 12), (2, 3)) == []
+    # A rectangle, the corner is further away than reach[0] + reach[1] steps
+    assert grid.in_range((8, 9), (3, 4)) == [player, enemy]
+
+    grid.move(player, (5, 5), (6, 5))
+    assert set(grid.in_range((5, 5), (1, 0))) == {enemy, player}
+    assert grid.stacked == {}
@@ -0,0 +1,31 @@
+import pytest
+
+from rogue.main import TICK, Game, RandomWalkInput
+
+
+def play(threaded_ai: bool, use_actor_store: bool, frames: int) -> dict:
+    game = Game(headless=True, input_source=RandomWalkInput(6), seed=7, map_size=(120, 80), max_rooms=200,
+                threaded_ai=threaded_ai, use_actor_store=use_actor_store)
+    turns = {}
+    for _ in range(frames):
+        game.dt = TICK
+        game.update()
+        turns[game.turn] = (game.player.tile_position,
+                            [enemy.tile_position for enemy in game.tilemap.enemies],
+                            [enemy.ai_state for enemy in game.tilemap.enemies])
+    if game.planner is not None:
+        game.planner.shutdown()
+    game.prefetcher.shutdown()
+    return turns
+
+
+@pytest.mark.parametrize("use_actor_store", [False, True])
+def test_threaded_planning_plays_the_same_turns(use_actor_store):
+    synchronous = play(False, use_actor_store, 4000)
+    threaded = play(True, use_actor_store, 4000)
+    # A plan is committed a frame after it was made, so the threaded game is a few turns behind.
+    # The last turn either reached can still be underway
+    turns = sorted(synchronous.keys() & threaded.keys())[:-1]
+    assert len(turns) > 100
+    for turn in turns:
+        assert threaded[turn] == synchronous[turn], f"turn {turn}"
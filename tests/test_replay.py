@@ -0,0 +1,63 @@
+import pytest
+
+from rogue.main import TICK, Game, RandomWalkInput
+from rogue.replay import InputLog, InputRecorder, Replay, checksum
+
+
+def record(frames: int, **settings) -> tuple[InputLog, str]:
+    game = Game(headless=True, input_source=RandomWalkInput(2), seed=11, **settings)
+    game.recorder = InputRecorder(game.settings())
+    for _ in range(frames):
+        game.dt = TICK
+        game.update()
+        game.end_frame()
+    if game.planner is not None:
+        game.planner.shutdown()
+    game.prefetcher.shutdown()
+    return game.recorder.log(game), checksum(game)
+
+
+def replay(log: InputLog) -> Game:
+    game = Game(headless=True, **dict(log.settings, map_size=tuple(log.settings["map_size"])))
+    game.replay = Replay(log)
+    while game.running:
+        game.update()
+        game.end_frame()
+    if game.planner is not None:
+        game.planner.shutdown()
+    game.prefetcher.shutdown()
+    return game
+
+
+@pytest.mark.parametrize("use_actor_store", [False, True])
+def test_replay_reproduces_the_checksum(tmp_path, use_actor_store):
+    log, final_checksum = record(1500, use_actor_store=use_actor_store)
+    assert log.final_checksum == final_checksum
+    path = tmp_path / "session.npz"
+    log.save(str(path))
+
+    game = replay(InputLog.load(str(path)))
+    assert game.turn > 0
+    assert checksum(game) == final_checksum
+    assert game.replay.report(game)
+
+
+def test_replay_detects_other_input(tmp_path):
+    log, final_checksum = record(600)
+    log.directions = log.directions[::-1].copy()
+    assert checksum(replay(log)) != final_checksum
+
+
+def test_real_time_replay_times_rendering():
+    log, final_checksum = record(60)
+    game = Game(headless=True, **dict(log.settings, map_size=tuple(log.settings["map_size"])))
+    game.replay = Replay(log)
+    game.run(240)
+
+    assert checksum(game) == final_checksum
+    results = game.replay.timings()
+    assert results["replay_tick"]["repeat"] == 60
+    # Faster than the simulation, so most renders fall between two ticks
+    assert results["replay_render"]["repeat"] > 60
+    total = sum(game.replay.frame_times) + sum(game.replay.render_times)
+    assert results["replay_total"]["median"] == pytest.approx(total)
@@ -0,0 +1,33 @@
+import pickle
+
+from rogue.enums import AIState
+from rogue.main import TICK, Game, RandomWalkInput
+from rogue.prefetch import prepare_level
+
+
+def test_graph_is_built_with_the_floor():
+    game = Game(headless=True, input_source=RandomWalkInput(3), seed=5, map_size=(120, 80), max_rooms=200,
+                threaded_ai=False, room_graph_pathing=True)
+    tilemap = game.tilemap
+    graph = tilemap.room_graph
+    assert graph is not None
+    assert not tilemap.use_flow_field
+    assert game.settings()["room_graph_pathing"]
+
+    start = [enemy.tile_position for enemy in tilemap.enemies]
+    for _ in range(3000):
+        game.dt = TICK
+        game.update()
+    assert game.turn > 0
+    assert any(enemy.ai_state == AIState.CHASING for enemy in tilemap.enemies)
+    assert [enemy.tile_position for enemy in tilemap.enemies] != start
+    # Paths were found without building another graph
+    assert tilemap.room_graph is graph
+    assert tilemap.flow_field is None
+    game.prefetcher.shutdown()
+
+
+def test_prepared_graph_shares_the_level_tiles():
+    level = pickle.loads(pickle.dumps(prepare_level((120, 80), 5, None, True, max_rooms=200)))
+    assert level.room_graph.all_tiles is level.all_tiles
+    assert prepare_level((120, 80), 5, None, False, max_rooms=200).room_graph is None
@@ -0,0 +1,51 @@
+from rogue.occupancy import OccupancyGrid
+from rogue.scheduler import NORMAL_SPEED, TurnScheduler
+
+
+class Actor:
+    def __init__(self, tile_position: tuple[int, int], speed: int = NORMAL_SPEED):
+        self.tile_position = tile_position
+        self.speed = speed
+        self.target_position = None
+
+    def simple_distance_to(self, other) -> int:
+        return abs(self.tile_position[0] - other.tile_position[0]) + abs(self.tile_position[1] - other.tile_position[1])
+
+
+def setup(*actors: Actor) -> tuple[Actor, OccupancyGrid]:
+    player = Actor((50, 50))
+    grid = OccupancyGrid((100, 100))
+    for actor in (player,) + actors:
+        grid.add(actor)
+    return player, grid
+
+
+def test_everything_on_screen_acts():
+    # The screen is 40x20 tiles centred on the player
+    corners = [Actor((50 + dx, 50 + dy)) for dx in (-20, 19) for dy in (-10, 9)]
+    seen = Actor((65, 58))
+    far = Actor((50, 80))
+    player, grid = setup(*corners, seen, far)
+    acting = TurnScheduler().take_turn(player, grid)
+    assert set(acting) == set(corners) | {seen}
+
+
+def test_closest_acts_first():
+    near, middle, far = Actor((52, 50)), Actor((50, 55)), Actor((60, 58))
+    player, grid = setup(far, near, middle)
+    assert TurnScheduler().take_turn(player, grid) == [near, middle, far]
+
+
+def test_speed_decides_how_often_an_actor_acts():
+    slow = Actor((51, 50), NORMAL_SPEED // 2)
+    normal = Actor((52, 50))
+    fast = Actor((53, 50), NORMAL_SPEED * 3)
+    player, grid = setup(slow, normal, fast)
+    scheduler = TurnScheduler()
+    turns = [scheduler.take_turn(player, grid) for _ in range(10)]
+
+    assert sum(slow in acting for acting in turns) == 5
+    assert all(acting.count(normal) == 1 for acting in turns)
+    # At most one action per turn, left over energy is not banked
+    assert all(acting.count(fast) == 1 for acting in turns)
+    assert scheduler.next_action[fast] == scheduler.time
@@ -0,0 +1,131 @@
+import random
+
+import numpy as np
+import pygame
+import pytest
+import tcod
+from tcod.map import compute_fov
+
+from rogue.autotile import compute_autotile_indices
+from rogue.enums import IntTiles
+from rogue.main import TICK, Game, RandomWalkInput
+from rogue.room_graph import RoomGraph
+from rogue.tile_layer import TileLayer
+
+
+@pytest.fixture
+def game():
+    game = Game(headless=True, input_source=RandomWalkInput(4), seed=8, map_size=(60, 40), max_rooms=80,
+                threaded_ai=False)
+    yield game
+    game.prefetcher.shutdown()
+
+
+def edit_near_player(game: Game, rng: random.Random) -> bool:
+    """Toggle a random tile around the player between wall and floor, never under an entity."""
+    tilemap = game.tilemap
+    px, py = game.player.tile_position
+    x = min(tilemap.size[0] - 2, max(1, px + rng.randint(-5, 5)))
+    y = min(tilemap.size[1] - 2, max(1, py + rng.randint(-5, 5)))
+    if tilemap.occupancy.at(x, y) is not None:
+        return False
+    return tilemap.set_tile(x, y, IntTiles.WALL if tilemap.all_tiles[x, y] else IntTiles.FLOOR)
+
+
+def play(game: Game, rng: random.Random, frames: int):
+    """Play with a terrain edit every few frames, rendering only some of the frames."""
+    for frame in range(frames):
+        game.dt = TICK
+        game.update()
+        if frame % 7 == 0:
+            edit_near_player(game, rng)
+        if frame % 3 == 0:
+            game.render_screen()
+    game.render_screen()
+
+
+def test_tile_indices_and_chunks_match_a_rebuild(game):
+    play(game, random.Random(2), 1500)
+    tilemap = game.tilemap
+    assert (tilemap.tile_indices == compute_autotile_indices(tilemap.all_tiles)).all()
+
+    fresh = TileLayer(tilemap.state_images, tilemap.tile_indices)
+    fresh.update(tilemap.tilemap_states)
+    assert fresh.chunks.keys() == tilemap.tile_layer.chunks.keys()
+    for key, chunk in fresh.chunks.items():
+        assert pygame.image.tobytes(chunk, "RGB") == pygame.image.tobytes(tilemap.tile_layer.chunks[key], "RGB")
+
+
+def test_fov_cache_matches_the_terrain(game):
+    play(game, random.Random(3), 1500)
+    tilemap = game.tilemap
+    assert tilemap.fov_cache
+    for (origin, radius), (window, mask) in tilemap.fov_cache.items():
+        local_origin = (origin[0] - window[0].start, origin[1] - window[1].start)
+        assert (compute_fov(tilemap.all_tiles[window], local_origin, radius=radius) == mask).all()
+
+
+def test_room_graph_matches_a_rebuild(game):
+    tilemap = game.tilemap
+    rng = random.Random(5)
+    tilemap.find_path(game.player.tile_position, game.player.tile_position)
+    for _ in range(200):
+        edit_near_player(game, rng)
+        # Query between edits, so stale cached edges and searches would be used
+        floor = np.argwhere(tilemap.all_tiles != IntTiles.WALL).tolist()
+        start, target = map(tuple, rng.sample(floor, 2))
+        tilemap.room_graph.path_to(start, target, lambda window: tilemap.all_tiles[window].astype(np.int8))
+
+    graph = tilemap.room_graph
+    fresh = RoomGraph(tilemap.all_tiles, tilemap.rooms)
+    floor = tilemap.all_tiles != IntTiles.WALL
+    # The same partition into regions, only the numbering differs
+    pairs = set(zip(graph.regions[floor].tolist(), fresh.regions[floor].tolist()))
+    assert len(pairs) == len({a for a, _ in pairs}) == len({b for _, b in pairs})
+
+    def links(room_graph: RoomGraph) -> set[tuple[int, int]]:
+        return {(int(fresh.regions[tile]), int(fresh.regions[across]))
+                for tile, crossings in room_graph.crossings.items() for across in crossings}
+
+    assert links(graph) == links(fresh)
+    cached = dict(graph.portal_edges)
+    graph.portal_edges.clear()
+    for tile, edges in cached.items():
+        assert sorted(graph.edges(tile)) == sorted(edges)
+
+
+def test_room_graph_paths_reach_reachable_targets(game):
+    tilemap = game.tilemap
+    rng = random.Random(7)
+    tilemap.find_path(game.player.tile_position, game.player.tile_position)
+    for _ in range(100):
+        edit_near_player(game, rng)
+    cost = tilemap.all_tiles.astype(np.int8)
+    floor = np.argwhere(tilemap.all_tiles != IntTiles.WALL).tolist()
+    for _ in range(30):
+        start, target = map(tuple, rng.sample(floor, 2))
+        pathfinder = tcod.path.Pathfinder(tcod.path.SimpleGraph(cost=cost, cardinal=2, diagonal=0))
+        pathfinder.add_root(start)
+        reachable = bool(len(pathfinder.path_to(target)) > 1)
+
+        position, steps = start, 0
+        while position != target and steps < 5000:
+            path = tilemap.find_path(position, target)
+            if not path:
+                break
+            for step in path:
+                assert abs(step[0] - position[0]) + abs(step[1] - position[1]) == 1
+                assert tilemap.all_tiles[step] != IntTiles.WALL
+                position = step
+                steps += 1
+        assert (position == target) == reachable
+
+
+def test_unchanged_tile_and_occupied_wall(game):
+    tilemap = game.tilemap
+    x, y = game.player.tile_position
+    version = tilemap.terrain_version
+    assert not tilemap.set_tile(x, y, IntTiles.FLOOR)
+    assert tilemap.terrain_version == version
+    with pytest.raises(ValueError):
+        tilemap.set_tile(x, y, IntTiles.WALL)
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from rogue.main import TICK, Game, RandomWalkInput
+from rogue.snapshot import Autosaver, capture, read
+
+
+def finish_turn(game: Game):
+    """Step until everything is at rest, the state a snapshot is taken in."""
+    while game.waiting_to_finish_movement or game.player.moving:
+        game.dt = TICK
+        game.update()
+
+
+def assert_same_snapshot(a, b):
+    for name, value in vars(a).items():
+        if isinstance(value, np.ndarray):
+            assert np.array_equal(value, getattr(b, name)), name
+        else:
+            assert value == getattr(b, name), name
+
+
+@pytest.mark.parametrize("use_actor_store", [False, True])
+def test_save_and_load_round_trip(tmp_path, use_actor_store):
+    path = str(tmp_path / "savegame.npz")
+    game = Game(headless=True, input_source=RandomWalkInput(2), seed=11, map_size=(60, 40), max_rooms=80,
+                use_actor_store=use_actor_store, threaded_ai=False)
+    game.run_headless(40)
+    finish_turn(game)
+    game.save_game(path)
+
+    loaded = Game(headless=True, input_source=RandomWalkInput(2), map_size=(10, 10),
+                  use_actor_store=use_actor_store, threaded_ai=False)
+    loaded.load_game(path)
+    assert_same_snapshot(capture(game), capture(loaded))
+    assert np.array_equal(game.tilemap.tilemap_states, loaded.tilemap.tilemap_states)
+
+    # Both play on the same way
+    game.input_source, loaded.input_source = RandomWalkInput(9), RandomWalkInput(9)
+    for _ in range(1500):
+        for played in (game, loaded):
+            played.dt = TICK
+            played.update()
+    assert loaded.turn == game.turn
+    assert [enemy.tile_position for enemy in loaded.tilemap.enemies] == \
+        [enemy.tile_position for enemy in game.tilemap.enemies]
+    for played in (game, loaded):
+        played.prefetcher.shutdown()
+
+
+def test_autosave_writes_a_loadable_snapshot(tmp_path):
+    game = Game(headless=True, input_source=RandomWalkInput(2), seed=11, map_size=(60, 40), max_rooms=80,
+                threaded_ai=False, autosave_interval=5)
+    game.autosaver.shutdown()
+    game.autosaver = Autosaver(str(tmp_path / "autosave.npz"))
+    game.run_headless(12)
+    snapshot = read(game.autosaver.path)
+    assert snapshot.turn == game.autosaver.saved_turn > 0
+    assert snapshot.seed == game.seed
+
+
+def test_streamed_floor_refuses_to_load(tmp_path):
+    path = str(tmp_path / "savegame.npz")
+    game = Game(headless=True, seed=11, map_size=(60, 40), max_rooms=80, threaded_ai=False)
+    finish_turn(game)
+    game.save_game(path)
+
+    streamed = Game(headless=True, seed=5, streamed=True, threaded_ai=False)
+    position = streamed.player.tile_position
+    streamed.load_game(path)
+    assert streamed.streamed
+    assert streamed.player.tile_position == position
@@ -0,0 +1,24 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame  # noqa: E402
+
+from rogue.world import StreamedTileMap, generate_chunk  # noqa: E402
+
+
+def test_hub_chunk_is_evicted_once_left_behind(tmp_path):
+    pygame.init()
+    # Room for the 9 chunks of the window and 3 more
+    world = StreamedTileMap(pygame.sprite.Group(), seed=4, memory_budget=12 * 32 * 32 * 2, directory=str(tmp_path))
+    start = world.player_position
+    for _ in range(4):
+        world.shift_window(1, 0)
+    world.shift_window(0, -2)
+
+    assert (0, 0) not in world.chunk_store.chunks
+    assert world.chunk_store.evicted > 0
+    # Still where chunk (0, 0)'s hub lies in the moved window
+    hub = generate_chunk(4, 0, 0, 32, max_rooms=50).hub
+    assert world.player_position == (-world.window_origin[0] * 32 + hub[0], -world.window_origin[1] * 32 + hub[1])
+    assert world.player_position == (start[0] - 4 * 32, start[1] + 2 * 32)